@@ -35,17 +35,20 @@ class AccountManager:
         self.store = store
         self.accounts = load_accounts(store)
 
-    def upload_all(self, video: str, title: str, **upload_kwargs) -> None:
-        """Upload ``video`` for every account concurrently."""
-        from concurrent.futures import ThreadPoolExecutor
-        from tiktok_uploader import login, upload_video
+    def upload_all(self, video: str, title: str, **upload_kwargs) -> Dict[str, bool]:
+        """Upload ``video`` for every account concurrently.
 
-        def worker(acc: Dict[str, str]):
-            user = acc["username"]
+        The file is read and checksummed once and every part is sent to all
+        accounts from the same buffer.
+        """
+        from tiktok_uploader import login
+        from tiktok_uploader.upload.uploader import upload_video_fanout
+
+        users = [acc["username"] for acc in self.accounts]
+        for user in users:
             login(user)
-            upload_video(user, video, title, **upload_kwargs)
+        results = upload_video_fanout(users, video, title, **upload_kwargs)
+        for acc in self.accounts:
             rotate_password(acc)
-
-        with ThreadPoolExecutor(max_workers=len(self.accounts) or 1) as ex:
-            list(ex.map(worker, self.accounts))
         save_accounts(self.store, self.accounts)
+        return results
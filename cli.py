@@ -5,12 +5,11 @@ import warnings
 
 warnings.filterwarnings("ignore", message="pkg_resources is deprecated")
 
-from tiktok_uploader import Video, login, upload_video
 from tiktok_uploader.utils.basics import eprint
 from tiktok_uploader.config.settings import Config
-from editor import process_videos
-from twitch import download_clips
-from scheduler import schedule_upload
+
+# Subcommands import what they use, so `show` or a plain upload does not load
+# selenium, moviepy, the ffmpeg pipeline or apscheduler.
 
 
 def main(argv=None):
@@ -29,6 +28,7 @@ def main(argv=None):
     # Login subcommand.
     login_parser = subparsers.add_parser("login", help="Войти в TikTok и сохранить cookies")
     login_parser.add_argument("-n", "--name", help="Имя для сохранения cookie", required=True)
+    login_parser.add_argument("-p", "--proxy", default=None, help="Прокси, через который работает аккаунт")
 
     # Upload subcommand.
     upload_parser = subparsers.add_parser("upload", help="Загрузить видео в TikTok")
@@ -45,11 +45,19 @@ def main(argv=None):
     upload_parser.add_argument("-bc", "--brandcontent", type=int, default=0)
     upload_parser.add_argument("-ai", "--ailabel", type=int, default=0)
     upload_parser.add_argument("-p", "--proxy", default="")
+    upload_parser.add_argument("-cc", "--concurrency", type=int, default=None, help="Число частей, загружаемых параллельно")
 
     # Show cookies
     show_parser = subparsers.add_parser("show", help="Показать доступных пользователей и видео")
     show_parser.add_argument("-u", "--users", action="store_true", help="Показать все сохранённые cookies")
     show_parser.add_argument("-v", "--videos", action="store_true", help="Показать все видео")
+    show_parser.add_argument("--dc", default=None, help="Только аккаунты этого датацентра (tt-target-idc)")
+
+    check_parser = subparsers.add_parser("check", help="Проверить сохранённые сессии")
+    check_parser.add_argument("-u", "--users", nargs="*", default=None, help="Аккаунты для проверки, по умолчанию все")
+    check_parser.add_argument("-c", "--concurrency", type=int, default=None, help="Число одновременных проверок")
+    check_parser.add_argument("-p", "--proxy", default=None, help="Прокси для аккаунтов без своего прокси")
+    check_parser.add_argument("--timeout", type=float, default=10, help="Таймаут запроса в секундах")
 
     edit_parser = subparsers.add_parser("edit", help="Пакетное редактирование видео")
     edit_parser.add_argument("src", help="Каталог с исходными видео")
@@ -58,6 +66,14 @@ def main(argv=None):
     edit_parser.add_argument("--end", type=float, default=None)
     edit_parser.add_argument("--rotate", type=int, default=None)
     edit_parser.add_argument("--speed", type=float, default=None)
+    edit_parser.add_argument("-j", "--jobs", type=int, default=1, help="Сколько видео обрабатывать одновременно")
+    edit_parser.add_argument("--threads", type=int, default=None, help="Всего потоков ffmpeg на все задачи")
+    edit_parser.add_argument("--watermark", default=None, help="Изображение водяного знака")
+    edit_parser.add_argument("--watermark-pos", type=int, nargs=2, default=(0, 0), metavar=("X", "Y"),
+                             help="Положение водяного знака")
+    edit_parser.add_argument("--watermark-scale", type=float, default=1.0, help="Масштаб водяного знака")
+    edit_parser.add_argument("--caption", default=None, help="Подпись в кадре 1080x1920")
+    edit_parser.add_argument("--layout", action="store_true", help="Кадр 1080x1920 без подписи")
 
     fetch_parser = subparsers.add_parser("fetch", help="Скачать клипы с Twitch")
     fetch_parser.add_argument("urls", nargs="+", help="Ссылки на клипы")
@@ -73,14 +89,21 @@ def main(argv=None):
     args = parser.parse_args(argv)
 
     if args.subcommand == "login":
+        from tiktok_uploader import login
+        from tiktok_uploader.utils.cookies import get_cookie_store
+
         if not hasattr(args, 'name') or args.name is None:
             parser.error("Параметр --name обязателен для подкоманды login")
         # Name of file to save the session id.
         login_name = args.name
         # Name of file to save the session id.
         login(login_name)
+        if args.proxy:
+            get_cookie_store().set_proxy(f"tiktok_session-{login_name}", args.proxy)
 
     elif args.subcommand == "upload":
+        from tiktok_uploader import upload_video
+
         # Obtain session id from the cookie name.
         if not hasattr(args, 'users') or args.users is None:
             parser.error("Параметр --users обязателен для подкоманды upload")
@@ -94,6 +117,8 @@ def main(argv=None):
             sys.exit(1)
 
         if args.youtube:
+            from tiktok_uploader import Video
+
             video_obj = Video(args.youtube, args.title)
             video_obj.is_valid_file_format()
             video = video_obj.source_ref
@@ -107,6 +132,13 @@ def main(argv=None):
                     print(f'[-] {name}')
                 sys.exit(1)
 
+        from tiktok_uploader.core.probe import validate_upload
+
+        problems = validate_upload(os.path.join(os.getcwd(), Config.get().videos_dir, args.video))
+        if problems:
+            eprint("Видео нельзя загрузить: " + "; ".join(problems))
+            sys.exit(1)
+
         upload_video(
             args.users,
             args.video,
@@ -120,16 +152,17 @@ def main(argv=None):
             args.brandcontent,
             args.ailabel,
             args.proxy,
+            args.concurrency,
         )
 
     elif args.subcommand == "show":
+        from tiktok_uploader.utils.cookies import list_accounts
+
         # if flag is c then show cookie names
         if args.users:
             print("Сохранённые пользователи:")
-            cookie_dir = os.path.join(os.getcwd(), Config.get().cookies_dir)
-            for name in os.listdir(cookie_dir):
-                if name.startswith("tiktok_session-"):
-                    print(f'[-] {name.split("tiktok_session-")[1]}')
+            for name in list_accounts(args.dc):
+                print(f'[-] {name}')
 
         # if flag is v then show video names
         if args.videos:
@@ -139,18 +172,42 @@ def main(argv=None):
                 print(f'[-] {name}')
         elif not args.users and not args.videos:
             print("Не указан флаг. Используйте -u или -v")
+    elif args.subcommand == "check":
+        from tiktok_uploader.upload.preflight import check_sessions
+
+        results = check_sessions(args.users, args.concurrency, args.proxy, args.timeout)
+        for name, result in results.items():
+            latency = f"{result['latency']:.2f} с" if result["latency"] is not None else "-"
+            print(f"[{'+' if result['status'] == 'ok' else '-'}] {name}: {result['status']}, {result['dc'] or '-'}, {latency}")
+        alive = sum(result["status"] == "ok" for result in results.values())
+        print(f"Рабочих сессий: {alive} из {len(results)}")
     elif args.subcommand == "edit":
-        for _ in process_videos(
-            args.src, args.dst, start=args.start, end=args.end, rotate=args.rotate, speed=args.speed
+        from editor import process_videos
+
+        failed = []
+
+        def report(path, error):
+            failed.append(path)
+            print(f"[-] {path}: {error}")
+
+        for path in process_videos(
+            args.src, args.dst, start=args.start, end=args.end, rotate=args.rotate, speed=args.speed,
+            jobs=args.jobs, threads=args.threads, on_error=report,
+            watermark=args.watermark, watermark_position=tuple(args.watermark_pos),
+            watermark_scale=args.watermark_scale, caption=args.caption, layout=args.layout,
         ):
-            pass
-        print("Готово")
+            print(f"[+] {path}")
+        print(f"Готово, ошибок: {len(failed)}" if failed else "Готово")
     elif args.subcommand == "fetch":
+        from twitch import download_clips
+
         download_clips(args.urls, args.out)
         print("Загрузка завершена")
     elif args.subcommand == "schedule":
         from datetime import datetime
 
+        from scheduler import schedule_upload
+
         when = datetime.fromisoformat(args.time)
         job_id = schedule_upload(when, args.accounts, args.video, args.title)
         print(f"Задача запланирована: {job_id}")
@@ -1,33 +1,51 @@
-"""Batch video editing utilities using ffmpeg-python.
+"""Batch video editing utilities built on ffmpeg.
 
 This module provides simple functions for trimming, rotating and changing
-playback speed of videos. It processes all videos within a directory and
-stores sidecar metadata describing the operations performed.
+playback speed of videos, optionally with a watermark and the TikTok
+caption layout. Every file is rendered by a single ffmpeg pass compiled
+from an :class:`~tiktok_uploader.core.pipeline.EditJob`. It processes all
+videos within a directory and stores sidecar metadata describing the
+operations performed. Several files can be processed at once with a shared
+CPU thread budget. Videos that are already TikTok-ready and only need
+trimming are remuxed without re-encoding.
 """
 
 from __future__ import annotations
 
-import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
 
-import ffmpeg
+from tiktok_uploader.core.pipeline import EditJob
+from tiktok_uploader.core.probe import ProbeError, probe
+from tiktok_uploader.core.render import is_tiktok_compatible, remux, write_sidecar
+from tiktok_uploader.utils.basics import eprint
 
 
-def _apply_basic_filters(stream, start: Optional[float], end: Optional[float],
-                         rotate: Optional[int], speed: Optional[float]):
-    if start is not None or end is not None:
-        stream = stream.trim(start=start or 0, end=end).setpts("PTS-STARTPTS")
-    if rotate:
-        if rotate == 90:
-            stream = stream.transpose(1)
-        elif rotate == 180:
-            stream = stream.hflip().vflip()
-        elif rotate == 270:
-            stream = stream.transpose(2)
-    if speed and speed > 0:
-        stream = stream.filter("setpts", f"{1/speed}*PTS")
-    return stream
+def _can_copy(job: EditJob) -> bool:
+    """True when the job is a plain trim of a TikTok-ready file."""
+    if job.rotate or job.speed or job.watermark or job.layout:
+        return False
+    try:
+        return is_tiktok_compatible(probe(job.source))
+    except ProbeError:
+        return False
+
+
+def _process_one(path: Path, out: Path, options: Dict[str, Any], threads: int) -> Path:
+    out_path = out / f"{path.stem}_edited.mp4"
+    job = EditJob(str(path), str(out_path), **options)
+    if _can_copy(job):
+        remux(job.source, job.output, job.start, job.end)
+        write_sidecar(job.output, {**job.describe(), "mode": "copy"})
+    else:
+        job.run(threads)
+    return out_path
+
+
+def _report(path: Path, error: Exception) -> None:
+    eprint(f"[-] {path}: {error}")
 
 
 def process_videos(
@@ -37,7 +55,15 @@ def process_videos(
     end: Optional[float] = None,
     rotate: Optional[int] = None,
     speed: Optional[float] = None,
-):
+    jobs: int = 1,
+    threads: Optional[int] = None,
+    on_error: Callable[[Path, Exception], None] = _report,
+    watermark: Optional[str] = None,
+    watermark_position: Tuple[int, int] = (0, 0),
+    watermark_scale: float = 1.0,
+    caption: Optional[str] = None,
+    layout: bool = False,
+) -> Iterator[Path]:
     """Process every video under ``source_dir`` recursively.
 
     Parameters
@@ -52,27 +78,55 @@ def process_videos(
         Rotation angle in degrees (90, 180, 270).
     speed: float
         Playback speed multiplier.
+    jobs: int
+        Number of ffmpeg processes running at the same time.
+    threads: int
+        Total encoder thread budget shared by the running jobs,
+        defaults to the number of CPUs.
+    on_error: callable
+        Called with the source path and the exception for every file
+        that failed; the rest of the batch keeps going.
+    watermark, watermark_position, watermark_scale:
+        Optional watermark image, its X/Y position and scale, as in
+        :func:`watermark.apply_watermark`.
+    caption: str
+        Caption text; places the video on the 1080x1920 TikTok frame
+        like ``Video.createVideo``.
+    layout: bool
+        Use the 1080x1920 frame without a caption.
+
+    A trim of an H.264/AAC 9:16 MP4 is done with stream copy, so the cut
+    starts at the nearest keyframe. The sidecar ``mode`` is ``"copy"`` or
+    ``"encode"``. Output paths are yielded as jobs finish, which with
+    ``jobs > 1`` is not the directory order.
     """
 
     src = Path(source_dir)
     out = Path(output_dir)
     out.mkdir(parents=True, exist_ok=True)
+    paths = sorted(src.rglob("*.mp4"))
+    options = {
+        "start": start, "end": end, "rotate": rotate, "speed": speed,
+        "watermark": watermark, "watermark_position": watermark_position,
+        "watermark_scale": watermark_scale, "caption": caption, "layout": layout,
+    }
+    jobs = max(1, min(jobs, len(paths) or 1))
+    per_job = max(1, (threads or os.cpu_count() or 1) // jobs)
 
-    for path in src.rglob("*.mp4"):
-        input_stream = ffmpeg.input(str(path))
-        filtered = _apply_basic_filters(input_stream, start, end, rotate, speed)
-        out_path = out / f"{path.stem}_edited.mp4"
-        ffmpeg.output(filtered, str(out_path)).overwrite_output().run()
-
-        meta = {
-            "source": str(path),
-            "output": str(out_path),
-            "start": start,
-            "end": end,
-            "rotate": rotate,
-            "speed": speed,
+    # Each worker thread only waits on its ffmpeg process, the encoding runs in the subprocesses.
+    pool = ThreadPoolExecutor(jobs)
+    try:
+        futures = {
+            pool.submit(_process_one, path, out, options, per_job): path
+            for path in paths
         }
-        meta_path = out_path.with_suffix(out_path.suffix + ".json")
-        meta_path.write_text(json.dumps(meta, indent=2, ensure_ascii=False))
-
-        yield out_path
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                on_error(futures[future], e)
+                continue
+            yield result
+    finally:
+        # A consumer that stops early does not wait for the queued files.
+        pool.shutdown(wait=True, cancel_futures=True)
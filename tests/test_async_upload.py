@@ -0,0 +1,88 @@
+import asyncio
+import datetime
+import os
+
+import requests
+import requests_auth_aws_sigv4
+from requests_auth_aws_sigv4 import AWSSigV4
+
+from tiktok_uploader.upload.async_uploader import upload_to_tiktok_async
+from tiktok_uploader.upload.parts import PartReader
+from tiktok_uploader.utils.bot_utils import sigv4_headers
+
+TOKEN = {'access_key_id': 'AKID', 'secret_acess_key': 'secret', 'session_token': 'token'}
+NOW = datetime.datetime(2024, 5, 1, 12, 30, 0)
+
+
+def test_sigv4_headers_match_requests_auth(monkeypatch):
+    class FixedDatetime(datetime.datetime):
+        @classmethod
+        def utcnow(cls):
+            return NOW
+
+    monkeypatch.setattr(requests_auth_aws_sigv4.datetime, 'datetime', FixedDatetime)
+    auth = AWSSigV4('vod', region='ap-singapore-1', aws_access_key_id='AKID',
+                    aws_secret_access_key='secret', aws_session_token='token')
+    url = 'https://www.tiktok.com/top/v1?Action=CommitUploadInner&Version=2020-11-19&SpaceName=tiktok'
+    body = '{"SessionKey":"k"}'
+    prepared = auth(requests.Request('POST', url, data=body).prepare())
+
+    headers = sigv4_headers('POST', url, body, TOKEN, now=NOW)
+    assert headers['Authorization'] == prepared.headers['Authorization']
+    assert headers['x-amz-content-sha256'] == prepared.headers['x-amz-content-sha256']
+
+
+class _FakeClient:
+    def __init__(self):
+        self.parts = {}
+
+    async def json(self, method, url, **kwargs):
+        if 'upload/auth' in url:
+            return {'video_token_v5': TOKEN}
+        node = {'Vid': 'v1', 'StoreInfos': [{'StoreUri': 'store', 'Auth': 'auth'}], 'UploadHost': 'host', 'SessionKey': 'key'}
+        return {'Result': {'InnerUploadAddress': {'UploadNodes': [node]}}}
+
+    async def request(self, method, url, headers=None, data=None, **kwargs):
+        await asyncio.sleep(0)
+        self.parts[headers['Content-Crc32']] = len(data)
+        return 200, b''
+
+
+def test_upload_to_tiktok_async_transfers_all_parts(tmp_path):
+    video = tmp_path / 'video.mp4'
+    video.write_bytes(os.urandom(2 * 5242880 + 7))
+    with PartReader(str(video)) as reader:
+        expected = [crc for _, _, crc in reader]
+
+    client = _FakeClient()
+    result = asyncio.run(upload_to_tiktok_async(client, str(video), concurrency=2))
+    assert result[3] == expected
+    assert sum(client.parts.values()) == video.stat().st_size
+
+
+def test_client_returns_none_on_network_errors():
+    import aiohttp
+
+    from tiktok_uploader.upload.async_uploader import _Client
+
+    class FailingRequest:
+        def __init__(self, error):
+            self.error = error
+
+        async def __aenter__(self):
+            raise self.error
+
+        async def __aexit__(self, *exc):
+            return False
+
+    class FakeHttp:
+        def __init__(self, error):
+            self.error = error
+
+        def request(self, method, url, **kwargs):
+            return FailingRequest(self.error)
+
+    for error in (aiohttp.ClientConnectionError('reset'), asyncio.TimeoutError()):
+        client = _Client(FakeHttp(error), None)
+        assert asyncio.run(client.request('GET', 'https://www.tiktok.com')) is None
+        assert asyncio.run(client.json('GET', 'https://www.tiktok.com')) is None
@@ -20,5 +20,28 @@ def test_save_cookies(tmp_path):
     cfg._options['COOKIES_DIR'] = str(tmp_path)
     data = [{'name': 'a', 'value': '1'}]
     save_cookies_to_file(data, 'foo', cookies_path=str(tmp_path))
-    path = tmp_path / 'foo.cookie'
-    assert path.exists()
+    assert (tmp_path / 'sessions.db').exists()
+    assert load_cookies_from_file('foo', cookies_path=str(tmp_path)) == data
+
+
+def test_cookie_store_imports_pickles_and_lists_by_dc(tmp_path):
+    from tiktok_uploader.utils.cookies import CookieStore, list_accounts, update_dc_location
+
+    for name, dc in (('alice', 'useast5'), ('bob', 'useast2a'), ('carol', 'useast5')):
+        with open(tmp_path / f'tiktok_session-{name}.cookie', 'wb') as f:
+            pickle.dump([{'name': 'sessionid', 'value': name}, {'name': 'tt-target-idc', 'value': dc}], f)
+    with open(tmp_path / 'tiktok_session-broken.cookie', 'wb') as f:
+        f.write(b'not a pickle')
+
+    assert list_accounts(cookies_path=str(tmp_path)) == ['alice', 'bob', 'carol']
+    assert list_accounts('useast5', cookies_path=str(tmp_path)) == ['alice', 'carol']
+    update_dc_location('tiktok_session-bob', 'useast5', cookies_path=str(tmp_path))
+    assert list_accounts('useast5', cookies_path=str(tmp_path)) == ['alice', 'bob', 'carol']
+
+    # A second store on the same file, like another worker process, sees the write.
+    other = CookieStore(str(tmp_path))
+    assert other.load('tiktok_session-bob')[-1] == {'name': 'tt-target-idc', 'value': 'useast5'}
+    other.save('tiktok_session-alice', [{'name': 'sessionid', 'value': 'new'}])
+    cookies = load_cookies_from_file('tiktok_session-alice', cookies_path=str(tmp_path))
+    assert cookies == [{'name': 'sessionid', 'value': 'new'}]
+    assert list_accounts('useast5', cookies_path=str(tmp_path)) == ['bob', 'carol']
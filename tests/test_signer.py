@@ -0,0 +1,142 @@
+import shutil
+import subprocess
+from urllib.parse import urlsplit
+
+import pytest
+
+from tiktok_uploader.utils import signer
+
+FAKE_DAEMON = r'''
+const readline = require("readline");
+readline.createInterface({ input: process.stdin }).on("line", (line) => {
+  const request = JSON.parse(line);
+  if (request.method === "crash") process.exit(3);
+  const data = request.method === "sign"
+    ? { signature: "sig", "x-bogus": "bogus", url: request.params.url, pid: process.pid }
+    : { pid: process.pid };
+  process.stdout.write(JSON.stringify({ id: request.id, status: "ok", data: data }) + "\n");
+});
+'''
+
+needs_node = pytest.mark.skipif(shutil.which('node') is None, reason='node is not installed')
+
+
+@needs_node
+def test_signer_daemon_stays_warm_and_restarts(tmp_path):
+    script = tmp_path / 'daemon.js'
+    script.write_text(FAKE_DAEMON)
+    daemon = signer.SignerDaemon(str(script), timeout=10)
+    try:
+        first = daemon.sign('https://example.com/?a=1', 'ua')
+        second = daemon.sign('https://example.com/?a=2', 'ua')
+        assert first['signature'] == 'sig' and second['url'].endswith('a=2')
+        assert first['pid'] == second['pid']
+
+        with pytest.raises(signer.SignerError):
+            daemon.request('crash')
+        assert daemon.ping()
+        assert daemon.restarts == 1
+    finally:
+        daemon.close()
+
+
+def test_sign_url_falls_back_to_oneshot(monkeypatch):
+    class BrokenDaemon:
+        def sign(self, url, user_agent):
+            raise signer.SignerError('down')
+
+    monkeypatch.setattr(signer, 'get_daemon', lambda: BrokenDaemon())
+    monkeypatch.setattr(signer, 'subprocess_jsvmp', lambda js, ua, url: '{"status": "ok", "data": {"signature": "once"}}')
+    monkeypatch.setitem(signer.Config.get()._options, 'SIGNER_MODE', 'daemon')
+    assert signer.sign_url('https://example.com/?a=1', 'ua') == {'signature': 'once'}
+
+
+FAKE_BATCH = r'''
+const lines = require("fs").readFileSync(0, "utf-8").trim().split("\n").map((line) => JSON.parse(line));
+if (process.argv[2] !== "--batch" || process.argv[3] !== "3") process.exit(2);
+for (const request of lines.reverse()) {
+  const status = request.url.includes("bad") ? "error" : "ok";
+  process.stdout.write(JSON.stringify({ id: request.id, status: status, data: { url: request.url, ua: request.user_agent } }) + "\n");
+}
+'''
+
+
+@needs_node
+def test_subprocess_jsvmp_batch_keeps_request_order(tmp_path):
+    from tiktok_uploader.utils.bot_utils import subprocess_jsvmp_batch
+
+    script = tmp_path / 'browser.js'
+    script.write_text(FAKE_BATCH)
+    pending = [('https://a/?1', 'ua2'), ('https://a/?bad', 'ua1'), ('https://a/?3', 'ua1')]
+    results = subprocess_jsvmp_batch(str(script), pending, contexts=3, timeout=30)
+    assert results == [{'url': 'https://a/?1', 'ua': 'ua2'}, None, {'url': 'https://a/?3', 'ua': 'ua1'}]
+
+
+def _has_playwright():
+    if shutil.which('node') is None:
+        return False
+    check = subprocess.run(['node', '-e', 'require.resolve("playwright-chromium")'], cwd=signer.SIGNER_DIR, capture_output=True)
+    return check.returncode == 0
+
+
+SIGN_URL = 'https://www.tiktok.com/api/v1/web/project/post/?app_name=tiktok_web&channel=tiktok_web&device_platform=web&aid=1988&msToken=abc'
+SIGN_UA = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+
+def _xttparams(query):
+    script = 'process.stdout.write(require("./utils").xttparams(process.argv[1], "webapp1.0+202106"))'
+    return subprocess.run(['node', '-e', script, query], cwd=signer.SIGNER_DIR, capture_output=True, text=True).stdout
+
+
+@needs_node
+def test_vm_signer_output(monkeypatch):
+    monkeypatch.setitem(signer.Config.get()._options, 'SIGNER_BACKEND', 'vm')
+    data = signer.sign_once(SIGN_URL, SIGN_UA)
+    assert data['signature'].startswith('_02B4Z6wo00f01')
+    assert len(data['x-bogus']) == 28
+    assert data['signed_url'] == f"{SIGN_URL}&verifyFp={data['verify_fp']}&_signature={data['signature']}&X-Bogus={data['x-bogus']}"
+    query = urlsplit(data['signed_url'].split('&X-Bogus=')[0]).query
+    assert data['x-tt-params'] == _xttparams(query)
+    assert data['navigator']['user_agent'] == SIGN_UA
+
+
+@pytest.mark.skipif(not _has_playwright(), reason='playwright-chromium is not installed')
+def test_vm_signer_matches_browser_signer(monkeypatch):
+    outputs = {}
+    for backend in ('browser', 'vm'):
+        monkeypatch.setitem(signer.Config.get()._options, 'SIGNER_BACKEND', backend)
+        outputs[backend] = signer.sign_once(SIGN_URL, SIGN_UA)
+    browser, vm = outputs['browser'], outputs['vm']
+    # Signatures embed a timestamp, so the shape is compared rather than the exact value.
+    assert vm['verify_fp'] == browser['verify_fp']
+    assert vm['signature'][:14] == browser['signature'][:14]
+    assert len(vm['signature']) == len(browser['signature'])
+    assert vm['x-bogus'][:8] == browser['x-bogus'][:8]
+    assert len(vm['x-bogus']) == len(browser['x-bogus'])
+    assert vm['signed_url'].split('&_signature=')[0] == browser['signed_url'].split('&_signature=')[0]
+    assert vm['navigator']['user_agent'] == browser['navigator']['user_agent']
+
+
+def test_signer_processes_kill_hung_process_and_count(capsys):
+    import sys
+
+    from tiktok_uploader.utils.bot_utils import SignerProcesses
+
+    manager = SignerProcesses(limit=1, timeout=0.5)
+    hung = "import sys, time; sys.stderr.write('page stuck'); sys.stderr.flush(); time.sleep(30)"
+    assert manager.run([sys.executable, '-c', hung]) is None
+    assert 'page stuck' in capsys.readouterr().out
+    assert manager.run([sys.executable, '-c', 'import sys; sys.exit(2)']) is None
+    assert manager.run([sys.executable, '-c', 'print("ok")']) == 'ok\n'
+    stats = manager.stats()
+    assert (stats['launches'], stats['failures'], stats['timeouts']) == (3, 2, 1)
+
+
+def test_signer_processes_pass_bootstrap_mode(monkeypatch):
+    import sys
+
+    from tiktok_uploader.utils.bot_utils import SignerProcesses
+
+    monkeypatch.setitem(signer.Config.get()._options, 'SIGNER_BOOTSTRAP', 'local')
+    script = "import os; print(os.environ['SIGNER_BOOTSTRAP'])"
+    assert SignerProcesses().run([sys.executable, '-c', script]) == 'local\n'
@@ -0,0 +1,33 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ('moviepy', 'undetected_chromedriver', 'selenium', 'pytube', 'ffmpeg', 'apscheduler', 'aiohttp')
+
+
+def _loaded_modules(code):
+    # A fresh interpreter, so modules imported by other tests do not count.
+    proc = subprocess.run(
+        [sys.executable, '-c', f'{code}\nimport json, sys\nprint(json.dumps(sorted(sys.modules)))'],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.splitlines()[-1])
+
+
+def _heavy(modules):
+    return [name for name in modules if name.split('.')[0] in HEAVY]
+
+
+def test_package_import_is_lazy():
+    modules = _loaded_modules('import tiktok_uploader')
+    assert 'tiktok_uploader' in modules
+    assert not _heavy(modules)
+
+
+def test_cli_import_and_upload_path_skip_media_stack():
+    for code in ('import cli', 'import tiktok_uploader.upload.uploader'):
+        modules = _loaded_modules(code)
+        assert code.split()[-1] in modules, code
+        assert not _heavy(modules), code
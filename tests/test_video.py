@@ -0,0 +1,281 @@
+import os
+import subprocess
+
+import pytest
+
+from tiktok_uploader.config.settings import Config
+from tiktok_uploader.core import render
+
+
+def _make_video(path, size='640x360', seconds=2):
+    subprocess.run(
+        [render.ffmpeg_binary(), '-y', '-loglevel', 'error',
+         '-f', 'lavfi', '-i', f'testsrc=size={size}:rate=24:duration={seconds}',
+         '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+         '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-c:a', 'aac', '-shortest', str(path)],
+        check=True,
+    )
+    return str(path)
+
+
+@pytest.fixture
+def video_config(tmp_path, monkeypatch):
+    # The repo .env sets IMAGEMAGICK_BINARY to "", which moviepy rejects on import.
+    monkeypatch.setenv('IMAGEMAGICK_BINARY', 'auto-detect')
+    options = Config.get()._options
+    monkeypatch.setitem(options, 'POST_PROCESSING_VIDEO_PATH', str(tmp_path / 'out'))
+    (tmp_path / 'out').mkdir()
+    return options
+
+
+def test_ffmpeg_backend_matches_moviepy_geometry(tmp_path, video_config, monkeypatch):
+    from PIL import Image
+
+    from tiktok_uploader.core.video import Video
+
+    # moviepy 1.0.3 resizes with Image.ANTIALIAS, which Pillow 10 renamed to LANCZOS.
+    monkeypatch.setattr(Image, 'ANTIALIAS', Image.LANCZOS, raising=False)
+    source = _make_video(tmp_path / 'source.mp4')
+    outputs = {}
+    for backend in ('moviepy', 'ffmpeg'):
+        monkeypatch.setitem(video_config, 'RENDER_BACKEND', backend)
+        video = Video(source, '')
+        video.crop(0.5, 2)
+        path, clip = video.createVideo()
+        outputs[backend] = (tuple(clip.size), clip.duration)
+        clip.close()
+    # moviepy truncates 607.5 to 607, the ffmpeg backend rounds to an even height for yuv420p.
+    assert outputs['moviepy'][0] == (1080, 607)
+    assert outputs['ffmpeg'][0] == (1080, 608)
+    assert outputs['ffmpeg'][1] == pytest.approx(outputs['moviepy'][1], abs=0.1)
+    assert outputs['ffmpeg'][1] == pytest.approx(1.5, abs=0.1)
+
+
+def test_ffmpeg_backend_places_caption_under_video(tmp_path, video_config, monkeypatch):
+    from tiktok_uploader.core.video import Video
+
+    def fake_caption(text, path):
+        # ImageMagick is not needed to check the layout: a white 900x100 block stands in for the text.
+        subprocess.run(
+            [render.ffmpeg_binary(), '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', 'color=c=white:s=900x100',
+             '-frames:v', '1', path],
+            check=True,
+        )
+        return path
+
+    monkeypatch.setattr(render, 'render_caption', fake_caption)
+    monkeypatch.setitem(video_config, 'RENDER_BACKEND', 'ffmpeg')
+    video = Video(_make_video(tmp_path / 'source.mp4'), 'caption')
+    path, clip = video.createVideo()
+    assert tuple(clip.size) == (1080, 1920)
+    assert clip.duration == pytest.approx(2, abs=0.1)
+    frame = clip.get_frame(1)
+    caption_top = int(960 + 608 / 2 - 20)
+    assert frame[caption_top + 50, 540].min() > 200
+    assert frame[caption_top + 50, 40].max() < 40
+    assert frame[100, 540].max() < 40
+    clip.close()
+
+
+def test_probe_is_cached_and_gates_uploads(tmp_path, monkeypatch):
+    import json
+
+    from tiktok_uploader.core import probe
+    from tiktok_uploader.upload import uploader
+
+    monkeypatch.setitem(Config.get()._options, 'STATE_DIR', str(tmp_path / 'state'))
+    monkeypatch.setitem(Config.get()._options, 'UPLOAD_MAX_DURATION', '1')
+    monkeypatch.setenv('PATH', str(tmp_path / 'bin'))
+    source = _make_video(tmp_path / 'source.mp4', size='320x240')
+
+    # Without ffprobe the ffmpeg -i header is parsed.
+    info = probe.probe(source)
+    assert (info['width'], info['height'], info['video_codec'], info['audio_codec']) == (320, 240, 'h264', 'aac')
+    assert info['duration'] == pytest.approx(2, abs=0.1)
+    assert info['size'] == os.path.getsize(source)
+
+    monkeypatch.setattr(probe, '_run_ffmpeg_header', lambda path: pytest.fail('probe cache was not used'))
+    assert probe.probe(source) == info
+    assert probe.validate_upload(source) == ['длительность 2.0 с больше 1 с']
+
+    # ffprobe JSON output is used when ffprobe is on PATH.
+    (tmp_path / 'bin').mkdir()
+    ffprobe = tmp_path / 'bin' / 'ffprobe'
+    payload = {'format': {'duration': '12.5', 'bit_rate': '800000', 'format_name': 'mov,mp4'},
+               'streams': [{'codec_type': 'video', 'codec_name': 'mpeg4', 'width': 720, 'height': 1280}]}
+    ffprobe.write_text("#!/bin/sh\necho '%s'\n" % json.dumps(payload))
+    ffprobe.chmod(0o755)
+    other = tmp_path / 'other.mp4'
+    other.write_bytes(b'x')
+    assert probe.probe(str(other))['video_codec'] == 'mpeg4'
+    assert probe.validate_upload(str(other)) == ['длительность 12.5 с больше 1 с', 'видеокодек mpeg4 не поддерживается']
+
+    def no_network(*args, **kwargs):
+        raise AssertionError('a rejected video must not open a session')
+
+    monkeypatch.setattr(uploader, '_load_session', lambda user: ('sid', 'dc'))
+    monkeypatch.setattr(uploader, '_open_session', no_network)
+    assert uploader.upload_video('user', source, 'title') is False
+
+
+def test_tiktok_ready_sources_are_remuxed(tmp_path, video_config, monkeypatch):
+    import json
+
+    import editor
+    from tiktok_uploader.core import video as video_module
+
+    monkeypatch.setitem(Config.get()._options, 'STATE_DIR', str(tmp_path / 'state'))
+    # Only ffmpeg is on PATH: render.ffmpeg_binary() resolves it there and probe, without ffprobe, parses its header.
+    (tmp_path / 'bin').mkdir()
+    os.symlink(render.ffmpeg_binary(), tmp_path / 'bin' / 'ffmpeg')
+    monkeypatch.setenv('PATH', str(tmp_path / 'bin'))
+
+    (tmp_path / 'src').mkdir()
+    _make_video(tmp_path / 'src' / 'ready.mp4', size='360x640')
+    trimmed = list(editor.process_videos(str(tmp_path / 'src'), str(tmp_path / 'trim'), start=0.5, end=1.5))
+    sped_up = list(editor.process_videos(str(tmp_path / 'src'), str(tmp_path / 'fast'), speed=2))
+    meta = json.loads((tmp_path / 'trim' / 'ready_edited.mp4.json').read_text())
+    assert meta['mode'] == 'copy'
+    assert json.loads((tmp_path / 'fast' / 'ready_edited.mp4.json').read_text())['mode'] == 'encode'
+    assert (trimmed[0].exists(), sped_up[0].exists()) == (True, True)
+
+    monkeypatch.setattr(video_module, 'render_layout', lambda *a, **k: pytest.fail('a ready source was re-encoded'))
+    monkeypatch.setitem(video_config, 'RENDER_BACKEND', 'ffmpeg')
+    video = video_module.Video(_make_video(tmp_path / 'full.mp4', size='1080x1920'), '')
+    path, clip = video.createVideo()
+    assert tuple(clip.size) == (1080, 1920)
+    clip.close()
+    assert json.loads(open(path + '.json').read())['mode'] == 'copy'
+
+
+def test_process_videos_runs_jobs_in_parallel_and_reports_failures(tmp_path, monkeypatch):
+
+    import editor
+
+    monkeypatch.setitem(Config.get()._options, 'STATE_DIR', str(tmp_path / 'state'))
+    (tmp_path / 'bin').mkdir()
+    os.symlink(render.ffmpeg_binary(), tmp_path / 'bin' / 'ffmpeg')
+    monkeypatch.setenv('PATH', str(tmp_path / 'bin'))
+    (tmp_path / 'src' / 'nested').mkdir(parents=True)
+    for name in ('a', 'b'):
+        _make_video(tmp_path / 'src' / f'{name}.mp4', size='320x240', seconds=1)
+    (tmp_path / 'src' / 'nested' / 'broken.mp4').write_bytes(b'not a video')
+
+    budgets = []
+    process_one = editor._process_one
+
+    def spy(*args):
+        budgets.append(args[-1])
+        return process_one(*args)
+
+    monkeypatch.setattr(editor, '_process_one', spy)
+    failures = []
+    outputs = list(editor.process_videos(
+        str(tmp_path / 'src'), str(tmp_path / 'out'), speed=2, jobs=3, threads=7,
+        on_error=lambda path, error: failures.append(path.name),
+    ))
+    assert sorted(path.name for path in outputs) == ['a_edited.mp4', 'b_edited.mp4']
+    assert failures == ['broken.mp4']
+    assert budgets == [2, 2, 2]
+
+
+def test_edit_job_renders_all_steps_in_one_pass(tmp_path, monkeypatch):
+    import json
+
+    import numpy as np
+
+    from tiktok_uploader.core import pipeline
+    from tiktok_uploader.core.probe import probe
+
+    monkeypatch.setitem(Config.get()._options, 'STATE_DIR', str(tmp_path / 'state'))
+
+    def fake_caption(text, path):
+        subprocess.run(
+            [render.ffmpeg_binary(), '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', 'color=c=white:s=900x100',
+             '-frames:v', '1', path],
+            check=True,
+        )
+        return path
+
+    commands = []
+    run_ffmpeg = render.run_ffmpeg
+
+    def spy(args):
+        commands.append(args)
+        run_ffmpeg(args)
+
+    monkeypatch.setattr(render, 'render_caption', fake_caption)
+    monkeypatch.setattr(render, 'run_ffmpeg', spy)
+    source = _make_video(tmp_path / 'source.mp4', size='640x360', seconds=3)
+    logo = tmp_path / 'logo.png'
+    subprocess.run([render.ffmpeg_binary(), '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', 'color=c=red:s=40x40',
+                    '-frames:v', '1', str(logo)], check=True)
+    (tmp_path / 'out').mkdir()
+    output = str(tmp_path / 'out' / 'result.mp4')
+
+    job = pipeline.EditJob(source, output, start=0.5, end=2.5, rotate=90, speed=2, watermark=str(logo),
+                           watermark_position=(10, 10), watermark_scale=2, caption='caption')
+    job.run(threads=2)
+
+    assert len(commands) == 1
+    assert sorted(p.name for p in (tmp_path / 'out').iterdir()) == ['result.mp4', 'result.mp4.json']
+    info = probe(output)
+    assert (info['width'], info['height'], info['audio_codec']) == (1080, 1920, 'aac')
+    assert info['duration'] == pytest.approx(1, abs=0.15)
+    assert json.loads(open(output + '.json').read())['passes'] == 1
+
+    # The rotated 360x640 video fills the frame scaled by 3, so the 80 px watermark at (10, 10) covers 30..270 px.
+    frame = subprocess.run(
+        [render.ffmpeg_binary(), '-loglevel', 'error', '-ss', '0.5', '-i', output, '-frames:v', '1',
+         '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-'],
+        capture_output=True, check=True,
+    ).stdout
+    pixels = np.frombuffer(frame, np.uint8).reshape(1920, 1080, 3)
+    red = pixels[150, 150]
+    assert red[0] > 200 and red[1] < 60 and red[2] < 60
+
+
+def test_youtube_download_copies_only_tiktok_ready_video(tmp_path, monkeypatch):
+    import json
+    import shutil
+    import sys
+    import types
+
+    from tiktok_uploader.core.video import Video
+
+    monkeypatch.setitem(Config.get()._options, 'STATE_DIR', str(tmp_path / 'state'))
+    monkeypatch.setitem(Config.get()._options, 'VIDEOS_DIR', 'videos')
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'videos').mkdir()
+    audio = tmp_path / 'audio.m4a'
+    subprocess.run([render.ffmpeg_binary(), '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', 'sine=duration=1',
+                    '-c:a', 'aac', str(audio)], check=True)
+
+    class Stream:
+        def __init__(self, source, resolution=None):
+            self.source = source
+            self.resolution = resolution
+
+        def download(self, output_path, filename):
+            path = os.path.join(output_path, filename)
+            shutil.copy(self.source, path)
+            return path
+
+    class Streams(list):
+        def filter(self, progressive=False, only_audio=False, **kwargs):
+            if progressive:
+                return Streams()
+            return Streams(s for s in self if (s.resolution is None) == only_audio)
+
+        def first(self):
+            return self[0] if self else None
+
+    modes = {}
+    for size in ('360x640', '640x360'):
+        source = _make_video(tmp_path / f'{size}.mp4', size=size, seconds=1)
+        streams = Streams([Stream(source, '640p'), Stream(str(audio))])
+        monkeypatch.setitem(sys.modules, 'pytube', types.SimpleNamespace(YouTube=lambda url: types.SimpleNamespace(streams=streams)))
+        fake = types.SimpleNamespace(source_ref='https://youtu.be/x', config=Config.get())
+        path = Video.get_youtube_video(fake)
+        modes[size] = json.loads(open(path + '.json').read())['mode']
+    assert modes == {'360x640': 'copy', '640x360': 'encode'}
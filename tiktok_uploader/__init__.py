@@ -1,23 +1,37 @@
+import importlib
 import warnings
 
 warnings.filterwarnings("ignore", message="pkg_resources is deprecated")
 
-from .core.browser import Browser
-from .utils.cookies import load_cookies_from_file, save_cookies_to_file, delete_cookies_file, delete_all_cookies_files
-from .config.settings import Config
-from .core.video import Video
-from .upload.uploader import login, upload_video
-from .utils.basics import eprint
+# Public name -> module that defines it. The browser and video modules pull in
+# selenium and moviepy, so every name is imported on first access.
+_LAZY = {
+    'Browser': '.core.browser',
+    'load_cookies_from_file': '.utils.cookies',
+    'save_cookies_to_file': '.utils.cookies',
+    'delete_cookies_file': '.utils.cookies',
+    'delete_all_cookies_files': '.utils.cookies',
+    'Config': '.config.settings',
+    'Video': '.core.video',
+    'EditJob': '.core.pipeline',
+    'login': '.upload.uploader',
+    'upload_video': '.upload.uploader',
+    'upload_video_async': '.upload.async_uploader',
+    'upload_video_fanout': '.upload.uploader',
+    'eprint': '.utils.basics',
+}
 
-__all__ = [
-    'Browser',
-    'load_cookies_from_file',
-    'save_cookies_to_file',
-    'delete_cookies_file',
-    'delete_all_cookies_files',
-    'Config',
-    'Video',
-    'login',
-    'upload_video',
-    'eprint'
-]
+__all__ = list(_LAZY)
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
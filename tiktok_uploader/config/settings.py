@@ -18,7 +18,37 @@ class Config:
         "TMP_YOUTUBE_VIDEO_DIR": "",
         "LANG": "en", 
         "TIKTOK_BASE_URL": "https://www.tiktok.com/upload?lang=", 
-        "IMAGEMAGICK_BINARY": ""
+        "IMAGEMAGICK_BINARY": "",
+        "UPLOAD_CONCURRENCY": 1,
+        "STATE_DIR": "./StateDir",
+        "UPLOAD_JOURNAL_TTL": 3600,
+        "UPLOAD_PART_SIZE": 5242880,
+        "UPLOAD_MIN_PART_SIZE": 5242880,
+        "UPLOAD_MAX_PART_SIZE": 33554432,
+        "UPLOAD_PART_SECONDS": 4,
+        "METRICS_ENABLED": 0,
+        "METRICS_TEXTFILE": "",
+        "METRICS_PORT": 0,
+        "UPLOAD_RETRY_BUDGET": 20,
+        "UPLOAD_PART_ATTEMPTS": 4,
+        "UPLOAD_RETRY_DELAY": 1,
+        "PUBLISH_RATE_PER_HOUR": 0,
+        "PUBLISH_BURST": 1,
+        "DC_PUBLISH_RATE_PER_HOUR": 0,
+        "DC_PUBLISH_BURST": 1,
+        "PUBLISH_BACKOFF": 300,
+        "PUBLISH_MAX_DEFERRALS": 3,
+        "SIGNER_MODE": "daemon",
+        "SIGNER_TIMEOUT": 60,
+        "SIGNER_BATCH_CONTEXTS": 2,
+        "SIGNER_BACKEND": "browser",
+        "SIGNER_MAX_PROCS": 2,
+        "SIGNER_BOOTSTRAP": "remote",
+        "MENTION_CACHE_TTL": 604800,
+        "CHECK_CONCURRENCY": 16,
+        "RENDER_BACKEND": "moviepy",
+        "UPLOAD_MAX_DURATION": 600,
+        "UPLOAD_MAX_SIZE": 4294967296,
     }
 
     _EXCLUDE = ["#"]
@@ -75,6 +105,12 @@ class Config:
     def _insert_option(self, opt_name: str, value):
         self._options[opt_name] = value
 
+    def _get_int_option(self, opt_name: str) -> int:
+        value = self.get_option_by_name(opt_name)
+        if value is None or value == "":
+            value = Config._DEFAULT_OPTIONS[opt_name]
+        return int(value)
+
     @property
     def cookies_dir(self):
         """Path where selenium cookies are stored"""
@@ -134,3 +170,160 @@ class Config:
     def imagemagick_binary_path(self):
         """ImageMagick Binary path """
         return self.get_option_by_name("IMAGEMAGICK_BINARY")
+
+    @property
+    def upload_concurrency(self) -> int:
+        """Number of video parts uploaded in parallel"""
+        return self._get_int_option("UPLOAD_CONCURRENCY")
+
+    @property
+    def state_dir(self):
+        """Directory where upload journals and caches are stored"""
+        return self.get_option_by_name("STATE_DIR") or Config._DEFAULT_OPTIONS["STATE_DIR"]
+
+    @property
+    def upload_journal_ttl(self) -> int:
+        """Seconds an unfinished upload session can still be resumed"""
+        return self._get_int_option("UPLOAD_JOURNAL_TTL")
+
+    @property
+    def upload_part_size(self) -> int:
+        """Initial size of an upload part in bytes"""
+        return self._get_int_option("UPLOAD_PART_SIZE")
+
+    @property
+    def upload_min_part_size(self) -> int:
+        """Smallest part size the adaptive policy may choose"""
+        return self._get_int_option("UPLOAD_MIN_PART_SIZE")
+
+    @property
+    def upload_max_part_size(self) -> int:
+        """Largest part size the adaptive policy may choose"""
+        return self._get_int_option("UPLOAD_MAX_PART_SIZE")
+
+    @property
+    def upload_part_seconds(self) -> int:
+        """Target transfer time of one part for the adaptive policy"""
+        return self._get_int_option("UPLOAD_PART_SECONDS")
+
+    @property
+    def upload_retry_budget(self) -> int:
+        """Total number of request retries allowed per upload"""
+        return self._get_int_option("UPLOAD_RETRY_BUDGET")
+
+    @property
+    def upload_part_attempts(self) -> int:
+        """Attempts per transfer part, finish and commit request"""
+        return self._get_int_option("UPLOAD_PART_ATTEMPTS")
+
+    @property
+    def upload_retry_delay(self) -> float:
+        """Base backoff delay in seconds between retries"""
+        value = self.get_option_by_name("UPLOAD_RETRY_DELAY")
+        return float(Config._DEFAULT_OPTIONS["UPLOAD_RETRY_DELAY"] if value is None or value == "" else value)
+
+    @property
+    def publish_rate_per_hour(self) -> int:
+        """Posts per hour allowed for one account, 0 disables the limit"""
+        return self._get_int_option("PUBLISH_RATE_PER_HOUR")
+
+    @property
+    def publish_burst(self) -> int:
+        """Posts one account may publish back to back"""
+        return self._get_int_option("PUBLISH_BURST")
+
+    @property
+    def dc_publish_rate_per_hour(self) -> int:
+        """Posts per hour allowed for all accounts of one datacenter, 0 disables the limit"""
+        return self._get_int_option("DC_PUBLISH_RATE_PER_HOUR")
+
+    @property
+    def dc_publish_burst(self) -> int:
+        """Posts one datacenter may receive back to back"""
+        return self._get_int_option("DC_PUBLISH_BURST")
+
+    @property
+    def publish_backoff(self) -> int:
+        """Delay in seconds before a throttled post is retried, doubled on each deferral"""
+        return self._get_int_option("PUBLISH_BACKOFF")
+
+    @property
+    def publish_max_deferrals(self) -> int:
+        """How many times a throttled post is put back in the queue"""
+        return self._get_int_option("PUBLISH_MAX_DEFERRALS")
+
+    @property
+    def metrics_enabled(self) -> bool:
+        """Collect upload phase metrics"""
+        return bool(self._get_int_option("METRICS_ENABLED"))
+
+    @property
+    def metrics_textfile(self):
+        """Prometheus textfile the metrics are written to after each upload"""
+        return self.get_option_by_name("METRICS_TEXTFILE") or None
+
+    @property
+    def metrics_port(self) -> int:
+        """Port of the local Prometheus endpoint, 0 disables it"""
+        return self._get_int_option("METRICS_PORT")
+
+    @property
+    def signer_mode(self) -> str:
+        """How signatures are generated: "daemon" keeps a warm signer, "oneshot" starts one per post"""
+        return self.get_option_by_name("SIGNER_MODE") or Config._DEFAULT_OPTIONS["SIGNER_MODE"]
+
+    @property
+    def signer_timeout(self) -> int:
+        """Seconds to wait for one signature"""
+        return self._get_int_option("SIGNER_TIMEOUT")
+
+    @property
+    def signer_batch_contexts(self) -> int:
+        """Browser contexts used by one batch signing run"""
+        return self._get_int_option("SIGNER_BATCH_CONTEXTS")
+
+    @property
+    def signer_backend(self) -> str:
+        """Signer implementation: "browser" runs Chromium, "vm" runs the scripts in a Node vm context"""
+        return self.get_option_by_name("SIGNER_BACKEND") or Config._DEFAULT_OPTIONS["SIGNER_BACKEND"]
+
+    @property
+    def signer_max_procs(self) -> int:
+        """Signer processes allowed to run at the same time"""
+        return self._get_int_option("SIGNER_MAX_PROCS")
+
+    @property
+    def signer_bootstrap(self) -> str:
+        """Signer page: "remote" loads the live TikTok page, "local" serves bootstrap.html under the tiktok.com origin"""
+        return self.get_option_by_name("SIGNER_BOOTSTRAP") or Config._DEFAULT_OPTIONS["SIGNER_BOOTSTRAP"]
+
+    @property
+    def mention_cache_ttl(self) -> int:
+        """Seconds a resolved @mention user id is reused"""
+        return self._get_int_option("MENTION_CACHE_TTL")
+
+    @property
+    def check_concurrency(self) -> int:
+        """Sessions checked at the same time by the check command"""
+        return self._get_int_option("CHECK_CONCURRENCY")
+
+    @property
+    def render_backend(self) -> str:
+        """Video.createVideo renderer: "moviepy" composites frames in Python, "ffmpeg" runs one filter graph"""
+        return self.get_option_by_name("RENDER_BACKEND") or Config._DEFAULT_OPTIONS["RENDER_BACKEND"]
+
+    @property
+    def upload_max_duration(self) -> int:
+        """Longest video in seconds accepted before an upload starts"""
+        return self._get_int_option("UPLOAD_MAX_DURATION")
+
+    @property
+    def upload_max_size(self) -> int:
+        """Largest video file in bytes accepted before an upload starts"""
+        return self._get_int_option("UPLOAD_MAX_SIZE")
+
+    def state_path(self, *parts: str) -> str:
+        """Absolute path inside the state dir, parent directories are created"""
+        path = os.path.join(os.getcwd(), self.state_dir, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
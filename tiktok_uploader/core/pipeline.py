@@ -0,0 +1,152 @@
+"""Обрезка, поворот, скорость, водяной знак и подпись за один проход ffmpeg."""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from typing import Any, Dict, List, Tuple
+
+from . import render
+from .probe import probe
+
+ROTATIONS = {90: "transpose=1", 180: "hflip,vflip", 270: "transpose=2"}
+
+
+def _atempo(speed: float) -> str:
+    """Цепочка atempo: один фильтр принимает множитель только от 0.5 до 2."""
+    factors = []
+    while speed > 2:
+        factors.append(2.0)
+        speed /= 2
+    while speed < 0.5:
+        factors.append(0.5)
+        speed /= 0.5
+    factors.append(speed)
+    return ",".join(f"atempo={factor:g}" for factor in factors)
+
+
+class EditJob:
+    """Описание обработки одного видео, которое компилируется в один граф ffmpeg.
+
+    Операции применяются в том же порядке, что и по отдельности: обрезка,
+    поворот и скорость из ``editor``, затем водяной знак из ``watermark``
+    (координаты в пикселях повёрнутого видео), затем раскладка кадра
+    1080x1920 с подписью из ``Video.createVideo``. Видео декодируется и
+    кодируется один раз, промежуточных файлов нет.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        output: str,
+        start: float | None = None,
+        end: float | None = None,
+        rotate: int | None = None,
+        speed: float | None = None,
+        watermark: str | None = None,
+        watermark_position: Tuple[int, int] = (0, 0),
+        watermark_scale: float = 1.0,
+        caption: str | None = None,
+        layout: bool = False,
+    ) -> None:
+        if rotate and rotate not in ROTATIONS:
+            raise ValueError(f"Поворот {rotate} не поддерживается, допустимо: 90, 180, 270")
+        if speed is not None and speed <= 0:
+            raise ValueError("Скорость должна быть больше нуля")
+        self.source = source
+        self.output = output
+        self.start = start
+        self.end = end
+        self.rotate = rotate or None
+        self.speed = speed if speed and speed != 1 else None
+        self.watermark = watermark
+        self.watermark_position = tuple(watermark_position)
+        self.watermark_scale = watermark_scale
+        self.caption = caption or None
+        self.layout = layout or self.caption is not None
+
+    def describe(self) -> Dict[str, Any]:
+        """Параметры задачи для файла метаданных."""
+        return {
+            "source": self.source,
+            "output": self.output,
+            "start": self.start,
+            "end": self.end,
+            "rotate": self.rotate,
+            "speed": self.speed,
+            "watermark": self.watermark,
+            "watermark_position": list(self.watermark_position),
+            "watermark_scale": self.watermark_scale,
+            "caption": self.caption,
+            "layout": self.layout,
+        }
+
+    def filter_graph(self, size: Tuple[int, int], audio: bool) -> str:
+        """Граф ``-filter_complex`` для видео размера ``size``.
+
+        Вход 0 - исходник, дальше водяной знак и подпись, если они есть.
+        Выходы ``[out]`` и, при ``audio``, ``[aout]``.
+        """
+        width, height = size
+        steps = []
+        if self.rotate:
+            steps.append(ROTATIONS[self.rotate])
+            if self.rotate != 180:
+                width, height = height, width
+        if self.speed:
+            steps.append(f"setpts=PTS/{self.speed:g}")
+        parts = [f"[0:v]{','.join(steps or ['null'])}[edited]"]
+        label = "[edited]"
+        next_input = 1
+        if self.watermark:
+            parts.append(f"[{next_input}:v]scale=iw*{self.watermark_scale:g}:ih*{self.watermark_scale:g}[wm]")
+            x, y = self.watermark_position
+            parts.append(f"{label}[wm]overlay={x}:{y}[marked]")
+            label = "[marked]"
+            next_input += 1
+        if self.layout:
+            parts.append(render.layout_filter(
+                (width, height), self.caption is not None, label, f"[{next_input}:v]", background=True
+            ))
+        elif width % 2 or height % 2:
+            # libx264 with yuv420p needs even dimensions.
+            parts.append(f"{label}crop=trunc(iw/2)*2:trunc(ih/2)*2[out]")
+        else:
+            parts.append(f"{label}null[out]")
+        if audio:
+            parts.append(f"[0:a]{_atempo(self.speed) if self.speed else 'anull'}[aout]")
+        return ";".join(parts)
+
+    def command(self, info: Dict[str, Any], caption_path: str | None = None, threads: int = 0) -> List[str]:
+        """Команда ffmpeg для исходника с метаданными ``info`` из ``probe``."""
+        audio = info.get("audio_codec") is not None
+        args = [render.ffmpeg_binary(), "-y", "-hide_banner", "-loglevel", "error"]
+        args += [*render.trim_args(self.start, self.end), "-i", self.source]
+        if self.watermark:
+            args += ["-i", self.watermark]
+        if caption_path:
+            args += ["-loop", "1", "-i", caption_path]
+        args += ["-filter_complex", self.filter_graph((info["width"], info["height"]), audio), "-map", "[out]"]
+        if audio:
+            args += ["-map", "[aout]", "-c:a", "aac"]
+        if self.layout:
+            args += ["-r", str(render.FPS)]
+        args += [
+            "-c:v", "libx264", "-pix_fmt", "yuv420p",
+            "-threads", str(threads), "-movflags", "+faststart",
+            self.output,
+        ]
+        return args
+
+    def run(self, threads: int = 0) -> str:
+        """Выполняет задачу и пишет ``<output>.json`` с её параметрами.
+
+        Подпись рисуется ImageMagick во временный PNG, ошибки ImageMagick
+        дают OSError, ошибки ffmpeg - RuntimeError.
+        """
+        info = probe(self.source)
+        with tempfile.TemporaryDirectory() as tmp:
+            caption_path = render.render_caption(self.caption, os.path.join(tmp, "caption.png")) if self.caption else None
+            render.run_ffmpeg(self.command(info, caption_path, threads))
+        render.write_sidecar(self.output, {**self.describe(), "mode": "encode", "passes": 1})
+        return self.output
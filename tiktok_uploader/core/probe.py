@@ -0,0 +1,159 @@
+"""Метаданные медиафайлов через ffprobe с постоянным кэшем."""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+from typing import Any, Dict, List
+
+from ..config.settings import Config
+
+_CACHE_FILE = "probe.json"
+_cache_lock = threading.Lock()
+
+UPLOAD_CONTAINERS = (".mp4", ".mov", ".webm")
+UPLOAD_VIDEO_CODECS = ("h264", "hevc", "vp8", "vp9", "av1")
+
+
+class ProbeError(Exception):
+    """Файл не удалось прочитать как видео."""
+
+
+def _cache_key(path: str) -> str:
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+
+def _load_cache() -> Dict[str, Dict[str, Any]]:
+    path = Config.get().state_path(_CACHE_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(key: str, info: Dict[str, Any]) -> None:
+    with _cache_lock:
+        cache = _load_cache()
+        cache[key] = info
+        path = Config.get().state_path(_CACHE_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, path)
+
+
+def _number(value: Any, kind: type = float) -> Any:
+    try:
+        return kind(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _run_ffprobe(binary: str, path: str) -> Dict[str, Any]:
+    proc = subprocess.run(
+        [binary, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise ProbeError(proc.stderr.strip()[-500:] or f"ffprobe завершился с кодом {proc.returncode}")
+    try:
+        data = json.loads(proc.stdout or "{}")
+    except ValueError as e:
+        raise ProbeError(f"ffprobe вернул не JSON: {e}") from None
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+    fmt = data.get("format", {})
+    return {
+        "duration": _number(fmt.get("duration") or video.get("duration")),
+        "width": _number(video.get("width"), int),
+        "height": _number(video.get("height"), int),
+        "video_codec": video.get("codec_name"),
+        "audio_codec": audio.get("codec_name"),
+        "bitrate": _number(fmt.get("bit_rate"), int),
+        "format": fmt.get("format_name"),
+    }
+
+
+_DURATION_RE = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)(?:.*?bitrate: (\d+) kb/s)?")
+_VIDEO_RE = re.compile(r"Stream #.*?Video: (\w+).*?, (\d{2,5})x(\d{2,5})")
+_AUDIO_RE = re.compile(r"Stream #.*?Audio: (\w+)")
+_INPUT_RE = re.compile(r"Input #0, ([\w,]+), from")
+
+
+def _run_ffmpeg_header(path: str) -> Dict[str, Any]:
+    """Запасной путь без ffprobe: заголовок, который печатает ``ffmpeg -i``."""
+    from .render import ffmpeg_binary
+
+    proc = subprocess.run([ffmpeg_binary(), "-hide_banner", "-i", path], capture_output=True, text=True)
+    header = proc.stderr
+    duration = _DURATION_RE.search(header)
+    video = _VIDEO_RE.search(header)
+    if not duration or not video:
+        raise ProbeError(header.strip().splitlines()[-1] if header.strip() else "ffmpeg не распознал файл")
+    audio = _AUDIO_RE.search(header)
+    container = _INPUT_RE.search(header)
+    hours, minutes, seconds, kbps = duration.groups()
+    return {
+        "duration": int(hours) * 3600 + int(minutes) * 60 + float(seconds),
+        "width": int(video.group(2)),
+        "height": int(video.group(3)),
+        "video_codec": video.group(1),
+        "audio_codec": audio.group(1) if audio else None,
+        "bitrate": int(kbps) * 1000 if kbps else None,
+        "format": container.group(1) if container else None,
+    }
+
+
+def probe(path: str) -> Dict[str, Any]:
+    """Длительность, размер кадра, кодеки, битрейт и размер файла.
+
+    Результат кэшируется в ``STATE_DIR`` по пути, размеру и mtime файла,
+    поэтому повторный вызов для неизменённого файла не запускает ffprobe.
+    Без ffprobe в PATH разбирается заголовок ``ffmpeg -i``.
+    """
+    key = _cache_key(path)
+    cached = _load_cache().get(key)
+    if cached is not None:
+        return cached
+    binary = shutil.which("ffprobe")
+    info = _run_ffprobe(binary, path) if binary else _run_ffmpeg_header(path)
+    info["size"] = os.path.getsize(path)
+    _save_cache(key, info)
+    return info
+
+
+def validate_upload(path: str) -> List[str]:
+    """Причины, по которым файл нельзя загружать, пустой список - можно.
+
+    Проверяются расширение, размер файла, длительность
+    (``UPLOAD_MAX_DURATION``) и видеокодек, только по метаданным.
+    """
+    config = Config.get()
+    if not os.path.isfile(path):
+        return [f"файл не найден: {path}"]
+    problems = []
+    if not path.lower().endswith(UPLOAD_CONTAINERS):
+        problems.append(f"формат {os.path.splitext(path)[1] or '-'} не поддерживается, нужен {', '.join(UPLOAD_CONTAINERS)}")
+    size = os.path.getsize(path)
+    if size > config.upload_max_size:
+        problems.append(f"размер {size} байт больше {config.upload_max_size}")
+    try:
+        info = probe(path)
+    except ProbeError as e:
+        return problems + [f"не удалось прочитать видео: {e}"]
+    if not info.get("duration"):
+        problems.append("неизвестная длительность")
+    elif info["duration"] > config.upload_max_duration:
+        problems.append(f"длительность {info['duration']:.1f} с больше {config.upload_max_duration} с")
+    if info.get("video_codec") not in UPLOAD_VIDEO_CODECS:
+        problems.append(f"видеокодек {info.get('video_codec')} не поддерживается")
+    return problems
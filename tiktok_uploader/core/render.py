@@ -0,0 +1,200 @@
+"""Сборка кадра TikTok одним графом фильтров ffmpeg и пересборка без перекодирования."""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Any, Dict, List, Tuple
+
+from ..config.settings import Config
+
+FRAME_SIZE = (1080, 1920)
+BACKGROUND = "0x0a0a0a"
+CAPTION_WIDTH = 900
+FPS = 24
+
+
+def ffmpeg_binary() -> str:
+    """ffmpeg из PATH, иначе сборка из imageio-ffmpeg, которую использует moviepy."""
+    found = shutil.which("ffmpeg")
+    if found:
+        return found
+    import imageio_ffmpeg
+
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def imagemagick_binary() -> str:
+    binary = Config.get().imagemagick_binary_path
+    if binary:
+        return binary
+    found = shutil.which("magick") or shutil.which("convert")
+    if not found:
+        raise OSError("ImageMagick не найден, укажите IMAGEMAGICK_BINARY")
+    return found
+
+
+def render_caption(text: str, path: str) -> str:
+    """PNG с подписью шириной 900 px, как ``TextClip(method="caption")``."""
+    config = Config.get()
+    proc = subprocess.run(
+        [
+            imagemagick_binary(),
+            "-background", config.imagemagick_text_background_color,
+            "-fill", config.imagemagick_text_foreground_color,
+            "-font", config.imagemagick_font,
+            "-pointsize", str(config.imagemagick_font_size),
+            "-kerning", "-1",
+            "-size", f"{CAPTION_WIDTH}x",
+            "-gravity", "center",
+            f"caption:{text}",
+            f"PNG32:{path}",
+        ],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    if proc.returncode != 0:
+        raise OSError(f"ImageMagick завершился с кодом {proc.returncode}: {proc.stderr.strip()[-500:]}")
+    return path
+
+
+def scaled_height(size: Tuple[int, int]) -> int:
+    """Высота видео, приведённого к ширине кадра, чётная для yuv420p."""
+    width, height = size
+    return max(2, round(FRAME_SIZE[0] * height / width / 2) * 2)
+
+
+def layout_filter(
+    size: Tuple[int, int],
+    caption: bool,
+    source: str = "[0:v]",
+    caption_input: str = "[1:v]",
+    background: bool = False,
+) -> str:
+    """Граф фильтров раскладки ``Video.createVideo``.
+
+    Видео масштабируется до ширины 1080. С подписью (или с
+    ``background=True``) оно ставится по центру фона 1080x1920, а подпись
+    - по центру по горизонтали, на 20 px выше нижнего края видео.
+    ``source`` и ``caption_input`` - метки входов, когда раскладка
+    продолжает другой граф.
+    """
+    height = scaled_height(size)
+    graph = f"{source}scale={FRAME_SIZE[0]}:{height},setsar=1"
+    if not (caption or background):
+        return graph + "[out]"
+    caption_y = int(FRAME_SIZE[1] / 2 + height / 2 - 20)
+    parts = [
+        graph + "[video]",
+        f"color=c={BACKGROUND}:s={FRAME_SIZE[0]}x{FRAME_SIZE[1]}:r={FPS}[bg]",
+        f"[bg][video]overlay=(W-w)/2:(H-h)/2:shortest=1[{'base' if caption else 'out'}]",
+    ]
+    if caption:
+        parts.append(f"[base]{caption_input}overlay=(W-w)/2:{caption_y}:shortest=1[out]")
+    return ";".join(parts)
+
+
+def layout_command(
+    source: str,
+    output: str,
+    size: Tuple[int, int],
+    caption_path: str | None = None,
+    start: float | None = None,
+    end: float | None = None,
+) -> List[str]:
+    """Команда ffmpeg, которая собирает кадр и кодирует его за один проход."""
+    args = [ffmpeg_binary(), "-y", "-hide_banner", "-loglevel", "error", *trim_args(start, end), "-i", source]
+    if caption_path:
+        args += ["-loop", "1", "-i", caption_path]
+    args += [
+        "-filter_complex", layout_filter(size, caption_path is not None),
+        "-map", "[out]", "-map", "0:a?",
+        "-r", str(FPS), "-c:v", "libx264", "-pix_fmt", "yuv420p", "-c:a", "aac",
+        "-threads", "0", "-movflags", "+faststart",
+        output,
+    ]
+    return args
+
+
+def run_ffmpeg(args: List[str]) -> None:
+    proc = subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg завершился с кодом {proc.returncode}: {proc.stderr.strip()[-500:]}")
+
+
+def trim_args(start: float | None, end: float | None) -> List[str]:
+    trim: List[str] = []
+    if start:
+        trim += ["-ss", str(start)]
+    if end is not None:
+        trim += ["-to", str(end)]
+    return trim
+
+
+def is_tiktok_compatible(info: Dict[str, Any]) -> bool:
+    """True для MP4 с H.264/AAC в кадре 9:16, такой файл можно не перекодировать."""
+    width, height = info.get("width"), info.get("height")
+    return (
+        "mp4" in (info.get("format") or "")
+        and info.get("video_codec") == "h264"
+        and info.get("audio_codec") in ("aac", None)
+        and bool(width and height)
+        and abs(width * 16 - height * 9) <= height * 9 * 0.01
+    )
+
+
+def remux_command(source: str, output: str, start: float | None = None, end: float | None = None) -> List[str]:
+    """Копирование потоков без перекодирования, moov переносится в начало файла."""
+    return [
+        ffmpeg_binary(), "-y", "-hide_banner", "-loglevel", "error", *trim_args(start, end), "-i", source,
+        "-map", "0", "-c", "copy", "-movflags", "+faststart", output,
+    ]
+
+
+def remux(source: str, output: str, start: float | None = None, end: float | None = None) -> str:
+    """Пересобирает контейнер за доли секунды.
+
+    Обрезка по ``start``/``end`` при копировании потоков начинается с
+    ближайшего ключевого кадра.
+    """
+    run_ffmpeg(remux_command(source, output, start, end))
+    return output
+
+
+def mux_audio(video: str, audio: str, output: str, copy_video: bool = True) -> str:
+    """Собирает видео и звук в MP4, звук кодируется в AAC.
+
+    С ``copy_video`` видеопоток копируется как есть, иначе кодируется в H.264.
+    """
+    video_codec = ["-c:v", "copy"] if copy_video else ["-c:v", "libx264", "-pix_fmt", "yuv420p", "-threads", "0"]
+    run_ffmpeg([
+        ffmpeg_binary(), "-y", "-hide_banner", "-loglevel", "error", "-i", video, "-i", audio,
+        "-map", "0:v:0", "-map", "1:a:0", *video_codec, "-c:a", "aac", "-shortest",
+        "-movflags", "+faststart", output,
+    ])
+    return output
+
+
+def write_sidecar(output: str, meta: Dict[str, Any]) -> str:
+    """Метаданные обработки рядом с файлом: ``<output>.json``."""
+    path = output + ".json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def render_layout(
+    source: str,
+    output: str,
+    size: Tuple[int, int],
+    text: str | None = None,
+    start: float | None = None,
+    end: float | None = None,
+) -> str:
+    """Собирает кадр с подписью ``text`` нативным ffmpeg на всех ядрах."""
+    with tempfile.TemporaryDirectory() as tmp:
+        caption_path = render_caption(text, os.path.join(tmp, "caption.png")) if text else None
+        run_ffmpeg(layout_command(source, output, size, caption_path, start, end))
+    return output
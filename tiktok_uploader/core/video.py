@@ -4,12 +4,14 @@ from __future__ import annotations
 
 import os
 import time
-from typing import Tuple
-
-from moviepy.editor import AudioFileClip, ColorClip, CompositeVideoClip, TextClip, VideoFileClip
-from pytube import YouTube
+from typing import TYPE_CHECKING, Tuple
 
 from ..config.settings import Config
+from .probe import ProbeError, probe
+from .render import FRAME_SIZE, is_tiktok_compatible, mux_audio, remux, render_layout, write_sidecar
+
+if TYPE_CHECKING:
+    from moviepy.editor import VideoFileClip
 
 
 class Video:
@@ -34,18 +36,66 @@ class Video:
         while not os.path.isfile(self.source_ref):
             time.sleep(1)
 
-        self.clip = VideoFileClip(self.source_ref)
+        # Container metadata is enough to know the duration and size, the clip is opened on first use.
+        self.info = probe(self.source_ref)
+        self._clip = None
+        self._trim: Tuple[float, float] | None = None
+
+    @property
+    def clip(self) -> VideoFileClip:
+        if self._clip is None:
+            from moviepy.editor import VideoFileClip
+
+            self._clip = VideoFileClip(self.source_ref)
+            if self._trim:
+                self._clip = self._clip.subclip(t_start=self._trim[0], t_end=self._trim[1])
+        return self._clip
+
+    @clip.setter
+    def clip(self, clip: VideoFileClip) -> None:
+        self._clip = clip
+
+    @property
+    def compatible(self) -> bool:
+        """Исходник уже в формате TikTok и может быть скопирован без перекодирования."""
+        return is_tiktok_compatible(self.info)
+
+    def _record(self, path: str, mode: str) -> None:
+        start, end = self._trim or (None, None)
+        write_sidecar(path, {"source": self.source_ref, "output": path, "mode": mode, "start": start, "end": end})
 
     def crop(self, start_time: float, end_time: float, saveFile: bool = False) -> VideoFileClip:
-        if end_time > self.clip.duration:
-            end_time = self.clip.duration
+        duration = self._trim[1] - self._trim[0] if self._trim else self.info.get("duration") or end_time
+        if end_time > duration:
+            end_time = duration
         save_path = os.path.join(os.getcwd(), self.config.videos_dir, "processed") + ".mp4"
-        self.clip = self.clip.subclip(t_start=start_time, t_end=end_time)
+        if self._clip is not None:
+            self._clip = self._clip.subclip(t_start=start_time, t_end=end_time)
+        offset = self._trim[0] if self._trim else 0
+        self._trim = (offset + start_time, offset + end_time)
         if saveFile:
-            self.clip.write_videofile(save_path)
+            if self.compatible:
+                remux(self.source_ref, save_path, *self._trim)
+                self._record(save_path, "copy")
+            else:
+                self.clip.write_videofile(save_path)
+                self._record(save_path, "encode")
         return self.clip
 
     def createVideo(self) -> Tuple[str, VideoFileClip]:
+        if not self.video_text and self.info["width"] == FRAME_SIZE[0] and self.compatible:
+            # Already 1080 wide and nothing to draw: only the container is rebuilt.
+            from moviepy.editor import VideoFileClip
+
+            dir_path = os.path.join(self.config.post_processing_video_path, "post-processed") + ".mp4"
+            remux(self.source_ref, dir_path, *(self._trim or (None, None)))
+            self._record(dir_path, "copy")
+            self.clip = VideoFileClip(dir_path)
+            return dir_path, self.clip
+        if self.config.render_backend == "ffmpeg":
+            return self._create_video_ffmpeg()
+        from moviepy.editor import ColorClip, CompositeVideoClip, TextClip
+
         self.clip = self.clip.resize(width=1080)
         base_clip = ColorClip(size=(1080, 1920), color=[10, 10, 10], duration=self.clip.duration)
         bottom_meme_pos = 960 + (((1080 / self.clip.size[0]) * (self.clip.size[1])) / 2) - 20
@@ -76,6 +126,23 @@ class Video:
 
         dir_path = os.path.join(self.config.post_processing_video_path, "post-processed") + ".mp4"
         self.clip.write_videofile(dir_path, fps=24)
+        self._record(dir_path, "encode")
+        return dir_path, self.clip
+
+    def _create_video_ffmpeg(self) -> Tuple[str, VideoFileClip]:
+        """Та же раскладка, что и в moviepy, одним графом фильтров ffmpeg."""
+        from moviepy.editor import VideoFileClip
+
+        dir_path = os.path.join(self.config.post_processing_video_path, "post-processed") + ".mp4"
+        start, end = self._trim or (None, None)
+        try:
+            render_layout(self.source_ref, dir_path, (self.info["width"], self.info["height"]), self.video_text, start, end)
+        except OSError as e:
+            print("Убедитесь, что ImageMagick установлен и путь к бинарному файлу указан верно")
+            print(e)
+            exit()
+        self._record(dir_path, "encode")
+        self.clip = VideoFileClip(dir_path)
         return dir_path, self.clip
 
     def is_valid_file_format(self) -> None:
@@ -83,6 +150,8 @@ class Video:
             exit(f"Файл {self.source_ref} имеет неверное расширение. Требуется .mp4 или .webm")
 
     def get_youtube_video(self, max_res: bool = True) -> str | bool:
+        from pytube import YouTube
+
         url = self.source_ref
         streams = YouTube(url).streams.filter(progressive=True)
         valid_streams = sorted(streams, reverse=True, key=lambda x: x.resolution is not None)
@@ -114,8 +183,15 @@ class Video:
                         return False
                     print("Ожидание появления файлов...")
 
-                composite_video = VideoFileClip(downloaded_v_path).set_audio(AudioFileClip(downloaded_a_path))
-                composite_video.write_videofile(video_path)
+                # The webm audio is always encoded to AAC, the video stream is copied only when TikTok-ready.
+                try:
+                    info = {**probe(downloaded_v_path), "audio_codec": "aac"}
+                except ProbeError:
+                    info = {}
+                mode = "copy" if is_tiktok_compatible(info) else "encode"
+                mux_audio(downloaded_v_path, downloaded_a_path, video_path, copy_video=mode == "copy")
+                write_sidecar(video_path, {"source": url, "video": downloaded_v_path, "audio": downloaded_a_path,
+                                           "output": video_path, "mode": mode})
                 return video_path
             else:
                 print("Все видео слишком низкого качества")
@@ -65,6 +65,7 @@ def tr(text: str) -> str:
 
 from tiktok_uploader import login, upload_video, Video
 from tiktok_uploader.config.settings import Config
+from tiktok_uploader.utils.cookies import list_accounts
 
 
 class MainWindow(QMainWindow):
@@ -171,12 +172,7 @@ class MainWindow(QMainWindow):
         return os.path.join(os.getcwd(), Config.get().videos_dir)
 
     def refresh_accounts(self):
-        accounts = []
-        dir_path = self.cookies_dir()
-        os.makedirs(dir_path, exist_ok=True)
-        for name in os.listdir(dir_path):
-            if name.startswith("tiktok_session-") and name.endswith(".cookie"):
-                accounts.append(name[len("tiktok_session-"):-7])
+        accounts = list_accounts()
         self.user_combo.clear()
         self.user_combo.addItems(accounts)
         self.users_list.clear()
@@ -0,0 +1,51 @@
+// Bench.js
+// Cold signer start-up: time from a fresh Signer to its first signature.
+// Usage: node bench.js [runs] [remote,local,vm]
+const URL_TO_SIGN = "https://www.tiktok.com/api/v1/web/project/post/?app_name=tiktok_web&channel=tiktok_web";
+
+const runs = parseInt(process.argv[2] || "3", 10);
+const modes = (process.argv[3] || "remote,local,vm").split(",");
+
+async function coldStart(mode) {
+  const started = process.hrtime.bigint();
+  let signer;
+  if (mode === "vm") {
+    const VmSigner = require("./vm-signer");
+    signer = new VmSigner();
+  } else {
+    process.env.SIGNER_BOOTSTRAP = mode;
+    const Signer = require("./index");
+    signer = new Signer();
+  }
+  await signer.init();
+  const ready = process.hrtime.bigint();
+  await signer.sign(URL_TO_SIGN);
+  const signed = process.hrtime.bigint();
+  await signer.close();
+  return { init_ms: Number(ready - started) / 1e6, sign_ms: Number(signed - ready) / 1e6 };
+}
+
+function median(values) {
+  const sorted = [...values].sort((a, b) => a - b);
+  return sorted[Math.floor(sorted.length / 2)];
+}
+
+(async function main() {
+  const report = {};
+  for (const mode of modes) {
+    const samples = [];
+    try {
+      for (let i = 0; i < runs; i++) {
+        samples.push(await coldStart(mode));
+      }
+      report[mode] = {
+        runs: samples.length,
+        init_ms: median(samples.map((s) => s.init_ms)),
+        sign_ms: median(samples.map((s) => s.sign_ms)),
+      };
+    } catch (err) {
+      report[mode] = { error: String((err && err.message) || err) };
+    }
+  }
+  console.log(JSON.stringify(report, null, 2));
+})();
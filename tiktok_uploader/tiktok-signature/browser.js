@@ -1,10 +1,17 @@
 // Browser.js
+// Usage:
+//   node browser.js <url> <user agent>      sign one URL
+//   node browser.js --batch [contexts]      sign newline-delimited JSON requests
+//                                           {"id": ..., "url": ..., "user_agent": ...}
+//                                           from stdin, one JSON result per line
+const readline = require("readline");
+const { chromium } = require("playwright-chromium");
 const Signer = require("./index");
 
 var url = process.argv[2];
 var userAgent = process.argv[3];
 
-(async function main() {
+async function single() {
   try {
     const signer = new Signer(url, userAgent);
     await signer.init();
@@ -24,4 +31,80 @@ var userAgent = process.argv[3];
   } catch (err) {
     console.error(err);
   }
-})();
+}
+
+async function batch(contexts) {
+  const browser = await chromium.launch(new Signer().options);
+  const queue = [];
+  const waiting = [];
+  let closed = false;
+
+  function next() {
+    if (queue.length || closed) {
+      return Promise.resolve(queue.shift());
+    }
+    return new Promise((resolve) => waiting.push(resolve));
+  }
+
+  function reply(message) {
+    process.stdout.write(JSON.stringify(message) + "\n");
+  }
+
+  // Each worker owns one context and keeps it while the user agent stays the same.
+  async function worker() {
+    let signer = null;
+    for (let request = await next(); request; request = await next()) {
+      try {
+        if (!signer || signer.userAgent !== (request.user_agent || signer.userAgent)) {
+          if (signer) {
+            await signer.context.close();
+          }
+          signer = new Signer(null, request.user_agent, browser);
+          await signer.init();
+        }
+        const sign = await signer.sign(request.url);
+        reply({ id: request.id, status: "ok", data: { ...sign, navigator: await signer.navigator() } });
+      } catch (err) {
+        reply({ id: request.id, status: "error", error: String((err && err.stack) || err) });
+        if (signer && signer.context) {
+          signer.context.close().catch(() => {});
+        }
+        signer = null;
+      }
+    }
+  }
+
+  const input = readline.createInterface({ input: process.stdin });
+  input.on("line", (line) => {
+    if (!line.trim()) {
+      return;
+    }
+    let request;
+    try {
+      request = JSON.parse(line);
+    } catch (err) {
+      reply({ id: null, status: "error", error: "Invalid JSON request" });
+      return;
+    }
+    const resolve = waiting.shift();
+    resolve ? resolve(request) : queue.push(request);
+  });
+  input.on("close", () => {
+    closed = true;
+    waiting.splice(0).forEach((resolve) => resolve(undefined));
+  });
+
+  await Promise.all(Array.from({ length: contexts }, worker));
+  await browser.close();
+}
+
+(async function main() {
+  if (url === "--batch") {
+    await batch(Math.max(1, parseInt(process.argv[3] || process.env.SIGNER_BATCH_CONTEXTS || "2", 10)));
+  } else {
+    await single();
+  }
+})().catch((err) => {
+  console.error(err);
+  process.exit(1);
+});
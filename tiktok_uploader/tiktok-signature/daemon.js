@@ -0,0 +1,125 @@
+// Daemon.js
+// Long-running signer: keeps Chromium and the signer pages warm and answers
+// newline-delimited JSON requests on stdin, one JSON reply per line on stdout.
+//   -> {"id": 1, "method": "sign", "params": {"url": "...", "user_agent": "..."}}
+//   <- {"id": 1, "status": "ok", "data": {...}}
+//   -> {"id": 2, "method": "ping"}
+// Usage: node daemon.js [browser|vm]
+const readline = require("readline");
+
+// "vm" signs in a Node vm context without Chromium, see vm-signer.js.
+const BACKEND = process.argv[2] || process.env.SIGNER_BACKEND || "browser";
+
+// Warm pages kept open, one per user agent, least recently used is closed first.
+const MAX_SIGNERS = parseInt(process.env.SIGNER_MAX_PAGES || "4", 10);
+
+let browser = null;
+const signers = new Map();
+
+async function getBrowser() {
+  if (!browser || !browser.isConnected()) {
+    const { chromium } = require("playwright-chromium");
+    const Signer = require("./index");
+    signers.clear();
+    browser = await chromium.launch(new Signer().options);
+    browser.on("disconnected", () => {
+      browser = null;
+      signers.clear();
+    });
+  }
+  return browser;
+}
+
+function dropSigner(key) {
+  const pending = signers.get(key);
+  signers.delete(key);
+  if (pending) {
+    pending.then((signer) => (BACKEND === "vm" ? signer.close() : signer.context.close())).catch(() => {});
+  }
+}
+
+async function getSigner(userAgent) {
+  const key = userAgent || "";
+  let pending = signers.get(key);
+  if (pending) {
+    signers.delete(key);
+    signers.set(key, pending);
+    return pending;
+  }
+
+  pending = (async () => {
+    let signer;
+    if (BACKEND === "vm") {
+      const VmSigner = require("./vm-signer");
+      signer = new VmSigner(null, userAgent);
+    } else {
+      const Signer = require("./index");
+      signer = new Signer(null, userAgent, await getBrowser());
+    }
+    await signer.init();
+    return signer;
+  })();
+  signers.set(key, pending);
+  pending.catch(() => signers.delete(key));
+
+  while (signers.size > MAX_SIGNERS) {
+    dropSigner(signers.keys().next().value);
+  }
+  return pending;
+}
+
+async function sign(params) {
+  let signer = await getSigner(params.user_agent);
+  let result;
+  try {
+    result = await signer.sign(params.url);
+  } catch (err) {
+    // A broken page is rebuilt once before the error is reported.
+    dropSigner(params.user_agent || "");
+    signer = await getSigner(params.user_agent);
+    result = await signer.sign(params.url);
+  }
+  return { ...result, navigator: await signer.navigator() };
+}
+
+async function handle(request) {
+  const params = request.params || {};
+  switch (request.method) {
+    case "sign":
+      return sign(params);
+    case "ping":
+      if (BACKEND !== "vm") {
+        await getBrowser();
+      }
+      return { backend: BACKEND, signers: signers.size };
+    default:
+      throw new Error(`Unknown method ${request.method}`);
+  }
+}
+
+function reply(message) {
+  process.stdout.write(JSON.stringify(message) + "\n");
+}
+
+const input = readline.createInterface({ input: process.stdin });
+
+input.on("line", (line) => {
+  let request;
+  try {
+    request = JSON.parse(line);
+  } catch (err) {
+    reply({ id: null, status: "error", error: "Invalid JSON request" });
+    return;
+  }
+  handle(request).then(
+    (data) => reply({ id: request.id, status: "ok", data: data }),
+    (err) => reply({ id: request.id, status: "error", error: String((err && err.stack) || err) })
+  );
+});
+
+input.on("close", async () => {
+  if (browser) {
+    await browser.close().catch(() => {});
+  }
+  process.exit(0);
+});
@@ -1,4 +1,3 @@
-const { createCipheriv } = require("crypto");
 const { devices, chromium } = require("playwright-chromium");
 const Utils = require("./utils");
 const iPhone11 = devices["iPhone 11 Pro"];
@@ -15,6 +14,10 @@ class Signer {
   // Default TikTok loading page
   default_url = "https://www.tiktok.com/@rihanna?lang=en";
 
+  // "local" serves bootstrap.html under the tiktok.com origin instead of loading the live page
+  bootstrap = process.env.SIGNER_BOOTSTRAP || "remote";
+  bootstrap_url = "https://www.tiktok.com/signer-bootstrap";
+
   // Password for xttparams AES encryption
   password = "webapp1.0+202106";
 
@@ -64,23 +67,36 @@ class Signer {
 
     this.page = await this.context.newPage();
 
+    const local = this.bootstrap === "local";
     await this.page.route("**/*", (route) => {
+      if (local && route.request().url() === this.bootstrap_url) {
+        return route.fulfill({
+          path: `${__dirname}/bootstrap.html`,
+          contentType: "text/html; charset=utf-8",
+        });
+      }
       return route.request().resourceType() === "script"
         ? route.abort()
         : route.continue();
     });
 
-    await this.page.goto(this.default_url, {
-      waitUntil: "networkidle",
-    });
+    if (local) {
+      await this.page.goto(this.bootstrap_url, {
+        waitUntil: "domcontentloaded",
+      });
+    } else {
+      await this.page.goto(this.default_url, {
+        waitUntil: "networkidle",
+      });
+    }
 
     let LOAD_SCRIPTS = ["signer.js", "webmssdk.js", "xbogus.js"];
-    LOAD_SCRIPTS.forEach(async (script) => {
+    for (const script of LOAD_SCRIPTS) {
       await this.page.addScriptTag({
         path: `${__dirname}/javascript/${script}`,
       });
       // console.log("[+] " + script + " loaded");
-    });
+    }
 
     await this.page.evaluate(() => {
       window.generateSignature = function generateSignature(url) {
@@ -90,11 +106,13 @@ class Signer {
         return window.byted_acrawler.sign({ url: url });
       };
 
-      window.generateBogus = function generateBogus(params) {
-        if (typeof window.generateBogus !== "function") {
+      // Keep xbogus.js' function, wrapping it in place would call itself.
+      const xbogus = window.generateBogus;
+      window.generateBogus = function generateBogus(params, userAgent) {
+        if (typeof xbogus !== "function") {
           throw "No X-Bogus function found";
         }
-        return window.generateBogus(params);
+        return xbogus(params, userAgent);
       };
       return this;
     });
@@ -135,12 +153,7 @@ class Signer {
   }
 
   xttparams(query_str) {
-    query_str += "&is_encryption=1";
-    // Encrypt query string using aes-128-cbc
-    const cipher = createCipheriv("aes-128-cbc", this.password, this.password);
-    return Buffer.concat([cipher.update(query_str), cipher.final()]).toString(
-      "base64"
-    );
+    return Utils.xttparams(query_str, this.password);
   }
 
   async close() {
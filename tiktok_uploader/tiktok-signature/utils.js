@@ -1,4 +1,15 @@
+const { createCipheriv } = require("crypto");
+
 class Utils {
+  // x-tt-params: the query string encrypted with aes-128-cbc
+  static xttparams(query_str, password) {
+    query_str += "&is_encryption=1";
+    const cipher = createCipheriv("aes-128-cbc", password, password);
+    return Buffer.concat([cipher.update(query_str), cipher.final()]).toString(
+      "base64"
+    );
+  }
+
   static getRandomInt(a, b) {
     const min = Math.min(a, b);
     const max = Math.max(a, b);
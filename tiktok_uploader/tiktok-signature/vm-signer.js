@@ -0,0 +1,136 @@
+// Vm-signer.js
+// Chromium-free Signer: runs the bundled scripts in a Node vm context with a
+// minimal window/navigator/document. Same interface as Signer in index.js.
+const fs = require("fs");
+const path = require("path");
+const vm = require("vm");
+const Utils = require("./utils");
+
+const LOAD_SCRIPTS = ["signer.js", "webmssdk.js", "xbogus.js"];
+
+// Compiled once per process, every signer runs them in its own context.
+let compiled = null;
+
+function loadScripts() {
+  if (!compiled) {
+    compiled = LOAD_SCRIPTS.map(
+      (script) =>
+        new vm.Script(fs.readFileSync(path.join(__dirname, "javascript", script), "utf-8"), {
+          filename: script,
+        })
+    );
+  }
+  return compiled;
+}
+
+const BROWSER_STUBS = `
+  var navigator = {
+    userAgent: USER_AGENT,
+    appCodeName: "Mozilla",
+    appName: "Netscape",
+    appVersion: USER_AGENT.replace(/^Mozilla\\//, ""),
+    platform: "MacIntel",
+    language: "en-US",
+    languages: ["en-US", "en"],
+    cookieEnabled: true,
+    webdriver: false,
+    plugins: [],
+    mimeTypes: [],
+  };
+  var location = new URL(DEFAULT_URL);
+  var document = {
+    cookie: "",
+    referrer: "",
+    documentElement: {},
+    createElement: function () {
+      return { style: {}, getContext: function () { return null; } };
+    },
+    addEventListener: function () {},
+  };
+  var devicePixelRatio = 1;
+  var screen = { width: 1920, height: 1080, availWidth: 1920, availHeight: 1080, colorDepth: 24 };
+  function addEventListener() {}
+`;
+
+class VmSigner {
+  userAgent =
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.109 Safari/537.36";
+  // Default TikTok loading page, used as location.href
+  default_url = "https://www.tiktok.com/@rihanna?lang=en";
+
+  // Password for xttparams AES encryption
+  password = "webapp1.0+202106";
+
+  constructor(default_url, userAgent) {
+    if (default_url) {
+      this.default_url = default_url;
+    }
+    this.userAgent = userAgent || this.userAgent;
+  }
+
+  async init() {
+    this.context = vm.createContext({
+      console: console,
+      URL: URL,
+      setTimeout: setTimeout,
+      clearTimeout: clearTimeout,
+      setInterval: setInterval,
+      clearInterval: clearInterval,
+      USER_AGENT: this.userAgent,
+      DEFAULT_URL: this.default_url,
+    });
+    // The scripts assign `var window = null`, a read-only window keeps the global like a browser does.
+    Object.defineProperty(this.context, "window", { value: this.context, writable: false });
+    Object.defineProperty(this.context, "self", { value: this.context, writable: false });
+    vm.runInContext(BROWSER_STUBS, this.context);
+    for (const script of loadScripts()) {
+      script.runInContext(this.context);
+    }
+    if (typeof this.context.byted_acrawler.sign !== "function") {
+      throw "No signature function found";
+    }
+    if (typeof this.context.generateBogus !== "function") {
+      throw "No X-Bogus function found";
+    }
+  }
+
+  async navigator() {
+    const navigator = this.context.navigator;
+    return {
+      deviceScaleFactor: this.context.devicePixelRatio,
+      user_agent: navigator.userAgent,
+      browser_language: navigator.language,
+      browser_platform: navigator.platform,
+      browser_name: navigator.appCodeName,
+      browser_version: navigator.appVersion,
+    };
+  }
+
+  async sign(link) {
+    let verify_fp = Utils.generateVerifyFp();
+    let newUrl = link + "&verifyFp=" + verify_fp;
+    let token = this.context.byted_acrawler.sign({ url: newUrl });
+    let signed_url = newUrl + "&_signature=" + token;
+    let queryString = new URL(signed_url).searchParams.toString();
+    let bogus = this.context.generateBogus(queryString, this.userAgent);
+    signed_url += "&X-Bogus=" + bogus;
+
+    return {
+      signature: token,
+      verify_fp: verify_fp,
+      signed_url: signed_url,
+      "x-tt-params": this.xttparams(queryString),
+      "x-bogus": bogus,
+    };
+  }
+
+  xttparams(query_str) {
+    return Utils.xttparams(query_str, this.password);
+  }
+
+  async close() {
+    this.context = null;
+  }
+}
+
+module.exports = VmSigner;
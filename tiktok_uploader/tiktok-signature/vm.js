@@ -0,0 +1,51 @@
+// Vm.js
+// Same usage as browser.js, but signs in a Node vm context without Chromium:
+//   node vm.js <url> <user agent>
+//   node vm.js --batch
+const readline = require("readline");
+const VmSigner = require("./vm-signer");
+
+var url = process.argv[2];
+var userAgent = process.argv[3];
+
+async function sign(signer, link) {
+  const sign = await signer.sign(link);
+  return { ...sign, navigator: await signer.navigator() };
+}
+
+async function single() {
+  const signer = new VmSigner(url, userAgent);
+  await signer.init();
+  console.log(JSON.stringify({ status: "ok", data: await sign(signer, url) }));
+  await signer.close();
+}
+
+async function batch() {
+  // Signing is synchronous CPU work here, one context per user agent is enough.
+  const signers = new Map();
+  const input = readline.createInterface({ input: process.stdin });
+  for await (const line of input) {
+    if (!line.trim()) {
+      continue;
+    }
+    let request = {};
+    try {
+      request = JSON.parse(line);
+      let signer = signers.get(request.user_agent);
+      if (!signer) {
+        signer = new VmSigner(null, request.user_agent);
+        await signer.init();
+        signers.set(request.user_agent, signer);
+      }
+      const data = await sign(signer, request.url);
+      process.stdout.write(JSON.stringify({ id: request.id, status: "ok", data: data }) + "\n");
+    } catch (err) {
+      process.stdout.write(JSON.stringify({ id: request.id, status: "error", error: String((err && err.stack) || err) }) + "\n");
+    }
+  }
+}
+
+(url === "--batch" ? batch() : single()).catch((err) => {
+  console.error(err);
+  process.exit(1);
+});
@@ -0,0 +1,244 @@
+"""Асинхронная загрузка видео на asyncio и aiohttp."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import uuid
+from typing import Any, Dict
+
+import aiohttp
+from yarl import URL
+
+from ..config.settings import Config
+from ..utils.bot_utils import (
+    PROFILE_CHUNK_SIZE,
+    UserIdNotFoundError,
+    UserIdScanner,
+    build_tags,
+    crc32,
+    find_mentions,
+    generate_random_string,
+    profile_request,
+    sigv4_headers,
+)
+from ..utils.mentions import get_mention_cache
+from ..utils.signer import sign_url
+from .parts import PartReader
+from .uploader import (
+    PUBLISH_URL,
+    _build_post_data,
+    _check_upload_params,
+    _load_session,
+    _post_params,
+    _random_user_agent,
+    _signature_url,
+)
+
+_TIKTOK_URL = URL("https://www.tiktok.com")
+
+
+class _Client:
+    """Обёртка над ``aiohttp.ClientSession`` с прокси и проверкой ответов."""
+
+    def __init__(self, http: aiohttp.ClientSession, proxy: str | None) -> None:
+        self.http = http
+        self.proxy = proxy or None
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> tuple[int, bytes] | None:
+        """Статус и тело ответа 200 или None, как ``_request`` в ``uploader``."""
+        try:
+            async with self.http.request(method, url, proxy=self.proxy, **kwargs) as resp:
+                body = await resp.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"[-] Ошибка соединения с {url}: {e!r}")
+            return None
+        if resp.status != 200:
+            print(f"[-] Ошибка при обращении к {url}")
+            print(f"{resp.status}")
+            print(f"{body}")
+            return None
+        return resp.status, body
+
+    async def json(self, method: str, url: str, **kwargs: Any) -> Dict[str, Any] | None:
+        result = await self.request(method, url, **kwargs)
+        return json.loads(result[1]) if result else None
+
+
+async def _sign(user_agent: str, mstoken: str | None) -> Dict[str, Any] | None:
+    """Подпись в пуле потоков, процессы подписи ограничены общим менеджером."""
+    return await asyncio.to_thread(sign_url, _signature_url(mstoken), user_agent)
+
+
+async def _convert_tags(client: _Client, title: str) -> tuple[str, list]:
+    async def lookup(username: str) -> str:
+        url, headers = profile_request(username)
+        async with client.http.get(url, headers=headers, proxy=client.proxy) as resp:
+            if resp.status != 200:
+                raise UserIdNotFoundError(f"profile @{username} answered {resp.status}")
+            scanner = UserIdScanner()
+            async for chunk in resp.content.iter_chunked(PROFILE_CHUNK_SIZE):
+                user_id = scanner.feed(chunk)
+                if user_id:
+                    # The rest of the page is not needed, drop the connection instead of draining it.
+                    resp.close()
+                    return user_id
+        raise UserIdNotFoundError(f"user id not found in profile @{username}")
+
+    return build_tags(title, await get_mention_cache().resolve_async(find_mentions(title), lookup))
+
+
+async def upload_to_tiktok_async(
+    client: _Client,
+    video_file: str,
+    concurrency: int | None = None,
+) -> tuple | bool:
+    """Асинхронный аналог ``upload_to_tiktok``.
+
+    Части читаются с диска в пуле потоков, одновременно в полёте не более
+    ``concurrency`` частей.
+    """
+    concurrency = max(1, concurrency or Config.get().upload_concurrency)
+    url = "https://www.tiktok.com/api/v1/video/upload/auth/?aid=1988"
+    auth = await client.json("GET", url)
+    if not auth:
+        return False
+    video_token = auth["video_token_v5"]
+
+    with PartReader(os.path.join(os.getcwd(), Config.get().videos_dir, video_file), Config.get().upload_part_size) as reader:
+        url = f"https://www.tiktok.com/top/v1?Action=ApplyUploadInner&Version=2020-11-19&SpaceName=tiktok&FileType=video&IsInner=1&FileSize={reader.size}&s=g158iqx8434"
+        applied = await client.json("GET", url, headers=sigv4_headers("GET", url, None, video_token))
+        if not applied:
+            return False
+
+        upload_node = applied["Result"]["InnerUploadAddress"]["UploadNodes"][0]
+        video_id = upload_node["Vid"]
+        store_uri = upload_node["StoreInfos"][0]["StoreUri"]
+        video_auth = upload_node["StoreInfos"][0]["Auth"]
+        upload_host = upload_node["UploadHost"]
+        session_key = upload_node["SessionKey"]
+        upload_id = str(uuid.uuid4())
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(index: int) -> str | None:
+            async with semaphore:
+                chunk = await asyncio.to_thread(reader.read, index)
+                crc = crc32(chunk)
+                url = f"https://{upload_host}/{store_uri}?partNumber={index + 1}&uploadID={upload_id}&phase=transfer"
+                headers = {
+                    "Authorization": video_auth,
+                    "Content-Type": "application/octet-stream",
+                    "Content-Disposition": 'attachment; filename="undefined"',
+                    "Content-Crc32": crc,
+                }
+                return crc if await client.request("POST", url, headers=headers, data=chunk) else None
+
+        crcs = await asyncio.gather(*(send(index) for index in range(len(reader))))
+        if not all(crcs):
+            return False
+
+    return video_id, session_key, upload_id, list(crcs), upload_host, store_uri, video_auth, video_token
+
+
+async def upload_video_async(
+    session_user: str,
+    video: str,
+    title: str,
+    schedule_time: int = 0,
+    allow_comment: int = 1,
+    allow_duet: int = 0,
+    allow_stitch: int = 0,
+    visibility_type: int = 0,
+    brand_organic_type: int = 0,
+    branded_content_type: int = 0,
+    ai_label: int = 0,
+    proxy: str | None = None,
+    upload_concurrency: int | None = None,
+    connector: aiohttp.BaseConnector | None = None,
+) -> bool:
+    """Асинхронная загрузка видео на TikTok.
+
+    Повторяет шаги ``upload_video`` без блокирующих вызовов, поэтому один
+    цикл событий может вести сотни загрузок. Общий ``connector`` позволяет
+    нескольким загрузкам использовать один пул соединений.
+    """
+    # fake_useragent and the cookie store do blocking I/O, keep it off the event loop.
+    user_agent = await asyncio.to_thread(_random_user_agent)
+    loaded = await asyncio.to_thread(_load_session, session_user)
+    if loaded is None:
+        return False
+    session_id, dc_id = loaded
+
+    print("Загрузка видео...")
+    if not _check_upload_params(schedule_time, title, visibility_type):
+        return False
+
+    jar = aiohttp.CookieJar()
+    jar.update_cookies({"sessionid": session_id, "tt-target-idc": dc_id}, _TIKTOK_URL)
+    headers = {
+        'User-Agent': user_agent,
+        'Accept': 'application/json, text/plain, */*',
+    }
+    async with aiohttp.ClientSession(
+        headers=headers, cookie_jar=jar, connector=connector, connector_owner=connector is None
+    ) as http:
+        client = _Client(http, proxy)
+
+        creation_id = generate_random_string(21, True)
+        project_url = f"https://www.tiktok.com/api/v1/web/project/create/?creation_id={creation_id}&type=1&aid=1988"
+        project = await client.json("POST", project_url)
+        if not project:
+            return False
+
+        upload_result = await upload_to_tiktok_async(client, video, upload_concurrency)
+        if not upload_result:
+            print("[-] Не удалось загрузить файл видео")
+            return False
+        video_id, session_key, upload_id, crcs, upload_host, store_uri, video_auth, video_token = upload_result
+
+        url = f"https://{upload_host}/{store_uri}?uploadID={upload_id}&phase=finish&uploadmode=part"
+        headers = {
+            "Authorization": video_auth,
+            "Content-Type": "text/plain;charset=UTF-8",
+        }
+        data = ",".join([f"{i + 1}:{crcs[i]}" for i in range(len(crcs))])
+        if not await client.request("POST", url, headers=headers, data=data):
+            return False
+
+        url = "https://www.tiktok.com/top/v1?Action=CommitUploadInner&Version=2020-11-19&SpaceName=tiktok"
+        data = '{"SessionKey":"' + session_key + '","Functions":[{"name":"GetMeta"}]}'
+        if not await client.request("POST", url, headers=sigv4_headers("POST", url, data, video_token), data=data):
+            return False
+
+        # publish video
+        url = "https://www.tiktok.com"
+        if not await client.request("HEAD", url, headers={"user-agent": user_agent}):
+            return False
+
+        markup_text, text_extra = await _convert_tags(client, title)
+        data = _build_post_data(creation_id, video_id, title, text_extra, schedule_time)
+
+        mstoken_cookie = jar.filter_cookies(_TIKTOK_URL).get("msToken")
+        mstoken = mstoken_cookie.value if mstoken_cookie else None
+        tt_output = await _sign(user_agent, mstoken)
+        if tt_output is None:
+            print("[-] Failed to generate signatures")
+            return False
+
+        headers = {
+            "content-type": "application/json",
+            "user-agent": user_agent,
+        }
+        params = {k: str(v) for k, v in _post_params(mstoken, tt_output).items() if v is not None}
+        posted = await client.json("POST", PUBLISH_URL, params=params, data=json.dumps(data), headers=headers)
+        if not posted:
+            print("[-] Published failed, try later again")
+            return False
+        if posted["status_code"] != 0:
+            print("[-] Publish failed to Tiktok")
+            print(posted)
+            return False
+
+    print(f"Published successfully {'| Scheduled for ' + str(schedule_time) if schedule_time else ''}")
+    return True
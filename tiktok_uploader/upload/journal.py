@@ -0,0 +1,98 @@
+"""Журнал загрузки для продолжения прерванных загрузок."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+from ..config.settings import Config
+
+
+class UploadJournal:
+    """Состояние загрузки одного видео одним аккаунтом.
+
+    Журнал хранится в ``STATE_DIR/uploads`` и содержит creation_id,
+    project_id, данные сессии загрузки, границы отправленных частей и
+    подтверждённые части с их CRC.
+    Ключ журнала зависит от аккаунта, пути, размера и mtime файла, поэтому
+    изменённое видео всегда загружается заново.
+    """
+
+    def __init__(self, path: str, state: Dict[str, Any] | None = None) -> None:
+        self.path = path
+        self._state: Dict[str, Any] = state or {"created_at": time.time(), "parts": {}, "layout": {}}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, session_user: str, video_path: str, ttl: int | None = None) -> "UploadJournal":
+        """Открывает журнал или создаёт новый, если старый устарел."""
+        stat = os.stat(video_path)
+        identity = f"{session_user}|{os.path.abspath(video_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        key = hashlib.sha1(identity.encode("utf-8")).hexdigest()
+        path = Config.get().state_path("uploads", f"{key}.json")
+        ttl = Config.get().upload_journal_ttl if ttl is None else ttl
+
+        journal = cls(path)
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = None
+            if state and time.time() - state.get("created_at", 0) < ttl:
+                journal._state = state
+            else:
+                journal.discard()
+        return journal
+
+    @property
+    def resumed(self) -> bool:
+        """True, если сессия загрузки восстановлена из журнала."""
+        return "upload_id" in self._state
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._state.get(key, default)
+
+    @property
+    def acked_parts(self) -> Dict[int, str]:
+        """Подтверждённые сервером части: номер -> crc32."""
+        with self._lock:
+            return {int(k): v for k, v in self._state["parts"].items()}
+
+    @property
+    def layout(self) -> Dict[int, Tuple[int, int]]:
+        """Границы запланированных частей: номер -> (смещение, размер)."""
+        with self._lock:
+            return {int(k): tuple(v) for k, v in self._state.get("layout", {}).items()}
+
+    def update(self, **fields: Any) -> None:
+        with self._lock:
+            self._state.update(fields)
+            self._save()
+
+    def ack_part(self, part_number: int, crc: str) -> None:
+        with self._lock:
+            self._state["parts"][str(part_number)] = crc
+            self._save()
+
+    def plan_part(self, part_number: int, offset: int, size: int) -> None:
+        with self._lock:
+            self._state.setdefault("layout", {})[str(part_number)] = [offset, size]
+            self._save()
+
+    def discard(self) -> None:
+        """Удаляет журнал, следующая загрузка начнётся с нуля."""
+        with self._lock:
+            self._state = {"created_at": time.time(), "parts": {}, "layout": {}}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def _save(self) -> None:
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._state, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,222 @@
+"""Метрики длительности этапов загрузки.
+
+По умолчанию метрики выключены: ``timer`` возвращает пустой контекстный
+менеджер, а ``observe_transfer`` сразу выходит. Включаются через
+``METRICS_ENABLED`` в конфигурации или вызовом ``enable``. Результаты
+доступны в текстовом формате Prometheus (HTTP-эндпоинт или textfile для
+node_exporter) и через функции обратного вызова.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Tuple
+from urllib.parse import urlsplit
+
+from ..config.settings import Config
+
+PHASE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+THROUGHPUT_BUCKETS = (65536, 262144, 1048576, 4194304, 16777216, 67108864)
+LABELS = ("account", "dc", "proxy")
+
+Callback = Callable[[str, str, float, Dict[str, str]], None]
+
+_NULL = contextlib.nullcontext()
+_registry: "Registry | None" = None
+_configured = False
+_setup_lock = threading.Lock()
+
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    """Хранилище гистограмм по этапам и меткам."""
+
+    def __init__(self) -> None:
+        self.phases: Dict[Tuple[str, ...], _Histogram] = {}
+        self.throughput: Dict[Tuple[str, ...], _Histogram] = {}
+        self.transfer_bytes: Dict[Tuple[str, ...], int] = {}
+        self.callbacks: List[Callback] = []
+        self.textfile: str | None = None
+        self._lock = threading.Lock()
+
+    def observe_phase(self, phase: str, seconds: float, labels: Dict[str, str]) -> None:
+        key = (phase, *(labels.get(name, "") for name in LABELS))
+        with self._lock:
+            self.phases.setdefault(key, _Histogram(PHASE_BUCKETS)).observe(seconds)
+        for callback in self.callbacks:
+            callback("phase_seconds", phase, seconds, labels)
+
+    def observe_transfer(self, nbytes: int, seconds: float, labels: Dict[str, str]) -> None:
+        key = tuple(labels.get(name, "") for name in LABELS)
+        rate = nbytes / max(seconds, 1e-6)
+        with self._lock:
+            self.throughput.setdefault(key, _Histogram(THROUGHPUT_BUCKETS)).observe(rate)
+            self.transfer_bytes[key] = self.transfer_bytes.get(key, 0) + nbytes
+        for callback in self.callbacks:
+            callback("transfer_bytes_per_second", "transfer", rate, labels)
+
+    def render(self) -> str:
+        """Текущие значения в текстовом формате Prometheus."""
+        lines = [
+            "# HELP tiktok_upload_phase_seconds Duration of upload pipeline phases.",
+            "# TYPE tiktok_upload_phase_seconds histogram",
+        ]
+        with self._lock:
+            for key, hist in sorted(self.phases.items()):
+                lines.extend(_render_histogram("tiktok_upload_phase_seconds", ("phase", *LABELS), key, hist))
+            lines.append("# HELP tiktok_upload_transfer_bytes_per_second Throughput of single part transfers.")
+            lines.append("# TYPE tiktok_upload_transfer_bytes_per_second histogram")
+            for key, hist in sorted(self.throughput.items()):
+                lines.extend(_render_histogram("tiktok_upload_transfer_bytes_per_second", LABELS, key, hist))
+            lines.append("# HELP tiktok_upload_transfer_bytes_total Bytes sent in transfer parts.")
+            lines.append("# TYPE tiktok_upload_transfer_bytes_total counter")
+            for key, total in sorted(self.transfer_bytes.items()):
+                lines.append(f"tiktok_upload_transfer_bytes_total{{{_render_labels(LABELS, key)}}} {total}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _render_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _render_histogram(name: str, names: Tuple[str, ...], key: Tuple[str, ...], hist: _Histogram) -> List[str]:
+    labels = _render_labels(names, key)
+    lines = [f'{name}_bucket{{{labels},le="{bound}"}} {count}' for bound, count in zip(hist.buckets, hist.counts)]
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {hist.count}')
+    lines.append(f"{name}_sum{{{labels}}} {hist.total}")
+    lines.append(f"{name}_count{{{labels}}} {hist.count}")
+    return lines
+
+
+class _Timer:
+    __slots__ = ("phase", "labels", "started")
+
+    def __init__(self, phase: str, labels: Dict[str, str]) -> None:
+        self.phase = phase
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        if _registry is not None:
+            _registry.observe_phase(self.phase, time.perf_counter() - self.started, self.labels)
+
+
+def enable(textfile: str | None = None, port: int | None = None) -> Registry:
+    """Включает сбор метрик, при ``port`` запускает HTTP-эндпоинт /metrics."""
+    global _registry
+    with _setup_lock:
+        if _registry is None:
+            _registry = Registry()
+        _registry.textfile = textfile or _registry.textfile
+    if port:
+        serve(port)
+    return _registry
+
+
+def disable() -> None:
+    global _registry
+    _registry = None
+
+
+def setup() -> None:
+    """Включает метрики по конфигурации, повторные вызовы ничего не делают."""
+    global _configured
+    if _configured:
+        return
+    _configured = True
+    config = Config.get()
+    if config.metrics_enabled:
+        enable(config.metrics_textfile, config.metrics_port)
+
+
+def add_callback(callback: Callback) -> None:
+    """Регистрирует ``callback(metric, phase, value, labels)`` для каждого измерения."""
+    enable().callbacks.append(callback)
+
+
+def proxy_label(proxy: str | None) -> str:
+    """Прокси без логина и пароля: ``scheme://host:port``."""
+    if not proxy:
+        return ""
+    parts = urlsplit(proxy if "://" in proxy else f"//{proxy}")
+    host = parts.hostname or ""
+    if parts.port:
+        host = f"{host}:{parts.port}"
+    return f"{parts.scheme}://{host}" if parts.scheme else host
+
+
+def bind(session: Any, account: str, dc: str | None, proxy: str | None) -> None:
+    """Привязывает метки аккаунта, датацентра и прокси к HTTP-сессии."""
+    if _registry is not None:
+        session.metric_labels = {"account": account, "dc": dc or "", "proxy": proxy_label(proxy)}
+
+
+def timer(phase: str, session: Any = None) -> contextlib.AbstractContextManager:
+    """Контекстный менеджер, измеряющий длительность этапа ``phase``."""
+    if _registry is None:
+        return _NULL
+    return _Timer(phase, getattr(session, "metric_labels", {}))
+
+
+def observe_transfer(session: Any, nbytes: int, seconds: float) -> None:
+    if _registry is not None:
+        _registry.observe_transfer(nbytes, seconds, getattr(session, "metric_labels", {}))
+
+
+def render() -> str:
+    return _registry.render() if _registry is not None else ""
+
+
+def flush() -> None:
+    """Записывает метрики в textfile, если он задан."""
+    if _registry is None or not _registry.textfile:
+        return
+    tmp_path = f"{_registry.textfile}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(_registry.render())
+    os.replace(tmp_path, _registry.textfile)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+def serve(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Запускает эндпоинт Prometheus в фоновом потоке."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
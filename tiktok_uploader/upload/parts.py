@@ -0,0 +1,92 @@
+"""Чтение видеофайла по частям для загрузки."""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Dict, Iterator, Tuple
+
+from ..utils.bot_utils import crc32
+
+DEFAULT_PART_SIZE = 5242880
+
+_manifests: Dict[Tuple[str, int, int], "PartManifest"] = {}
+_manifests_lock = threading.Lock()
+
+
+class PartReader:
+    """Читает части файла с диска по требованию.
+
+    Размер файла берётся из ``os.stat``, а каждая часть читается только в
+    момент отправки, поэтому в памяти одновременно находятся лишь
+    несколько частей независимо от размера видео.
+    """
+
+    def __init__(self, path: str, part_size: int = DEFAULT_PART_SIZE) -> None:
+        self.path = path
+        self.part_size = part_size
+        self.size = os.stat(path).st_size
+        self._file = open(path, "rb")
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "PartReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return (self.size + self.part_size - 1) // self.part_size
+
+    def read_range(self, offset: int, size: int) -> bytes:
+        """Читает ``size`` байт начиная с ``offset``."""
+        with self._lock:
+            self._file.seek(offset)
+            return self._file.read(size)
+
+    def read(self, index: int) -> bytes:
+        """Читает часть с индексом ``index`` (с нуля)."""
+        return self.read_range(index * self.part_size, self.part_size)
+
+    def __iter__(self) -> Iterator[Tuple[int, bytes, str]]:
+        """Отдаёт ``(номер части, данные, crc32)``, номера начинаются с 1."""
+        for index in range(len(self)):
+            chunk = self.read(index)
+            yield index + 1, chunk, crc32(chunk)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class PartManifest:
+    """CRC частей файла, посчитанные один раз на процесс.
+
+    Манифест привязан к пути, размеру и mtime файла, поэтому повторные
+    загрузки того же видео (в том числе в другие аккаунты) не пересчитывают CRC.
+    """
+
+    def __init__(self) -> None:
+        self._crcs: Dict[Tuple[int, int], str] = {}
+        self._lock = threading.Lock()
+
+    def crc(self, offset: int, chunk: bytes) -> str:
+        """CRC части, начинающейся с ``offset``."""
+        key = (offset, len(chunk))
+        with self._lock:
+            cached = self._crcs.get(key)
+        if cached is None:
+            cached = crc32(chunk)
+            with self._lock:
+                self._crcs[key] = cached
+        return cached
+
+
+def get_manifest(path: str) -> PartManifest:
+    """Манифест частей для текущей версии файла ``path``."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _manifests_lock:
+        manifest = _manifests.get(key)
+        if manifest is None:
+            manifest = _manifests[key] = PartManifest()
+        return manifest
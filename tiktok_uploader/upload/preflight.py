@@ -0,0 +1,82 @@
+"""Проверка сохранённых сессий до начала загрузки."""
+
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import requests
+
+from ..config.settings import Config
+from ..utils.cookies import SESSION_PREFIX, get_cookie_store
+from .uploader import _UA, _open_session
+
+AUTH_URL = "https://www.tiktok.com/api/v1/video/upload/auth/?aid=1988"
+
+STATUS_OK = "ok"
+STATUS_EXPIRED = "expired"
+STATUS_ERROR = "error"
+STATUS_MISSING = "missing"
+
+
+def check_session(session_user: str, proxy: str | None = None, timeout: float = 10) -> Dict[str, Any]:
+    """Проверяет одну сессию запросом upload/auth и сохраняет результат.
+
+    Используется прокси аккаунта из хранилища, ``proxy`` - для аккаунтов
+    без своего. Сетевая ошибка даёт статус ``error`` и не считается
+    истёкшей сессией.
+    """
+    store = get_cookie_store()
+    name = SESSION_PREFIX + session_user
+    cookies = store.load(name) or []
+    session_id = next((c["value"] for c in cookies if c["name"] == "sessionid"), None)
+    dc_id = next((c["value"] for c in cookies if c["name"] == "tt-target-idc"), None)
+    info = store.info(name) or {}
+    proxy = info.get("proxy") or proxy
+    result: Dict[str, Any] = {"status": STATUS_EXPIRED if info else STATUS_MISSING, "dc": dc_id, "latency": None, "proxy": proxy}
+
+    if session_id:
+        session = _open_session(session_id, dc_id or "useast2a", _UA, proxy, 1)
+        started = time.perf_counter()
+        try:
+            r = session.get(AUTH_URL, timeout=timeout, allow_redirects=False)
+            result["latency"] = time.perf_counter() - started
+            # A working session gets an upload token, an expired one an error body or a redirect.
+            try:
+                authorized = r.status_code == 200 and "video_token_v5" in r.json()
+            except ValueError:
+                authorized = False
+            result["status"] = STATUS_OK if authorized else STATUS_EXPIRED
+            result["dc"] = r.cookies.get("tt-target-idc") or dc_id
+        except requests.RequestException as e:
+            print(f"[-] {session_user}: {e}")
+            result["status"] = STATUS_ERROR
+        finally:
+            session.close()
+
+    if info:
+        store.record_check(name, result["status"], result["dc"], result["latency"])
+    return result
+
+
+def check_sessions(
+    session_users: List[str] | None = None,
+    concurrency: int | None = None,
+    proxy: str | None = None,
+    timeout: float = 10,
+) -> Dict[str, Dict[str, Any]]:
+    """Проверяет сессии всех или указанных аккаунтов параллельно.
+
+    Одновременно выполняется не больше ``concurrency`` запросов
+    (``CHECK_CONCURRENCY``). Статус, датацентр, задержка и время проверки
+    записываются в хранилище cookie, и пакетная загрузка пропускает
+    аккаунты с истёкшей сессией.
+    """
+    users = get_cookie_store().accounts() if session_users is None else list(session_users)
+    if not users:
+        return {}
+    concurrency = max(1, concurrency or Config.get().check_concurrency)
+    with ThreadPoolExecutor(min(concurrency, len(users))) as pool:
+        results = pool.map(lambda user: check_session(user, proxy, timeout), users)
+        return dict(zip(users, results))
@@ -0,0 +1,174 @@
+"""Ограничение частоты публикаций по аккаунтам и датацентрам."""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+from ..config.settings import Config
+
+RATE_LIMIT_MESSAGES = ("posting too fast", "take a rest", "too many requests", "too frequent")
+
+_limiter: "RateLimiter | None" = None
+_limiter_lock = threading.Lock()
+
+
+def is_rate_limited(resp: Any) -> bool:
+    """True, если ответ project/post означает превышение частоты публикаций."""
+    if resp.status_code == 429:
+        return True
+    try:
+        message = str(resp.json().get("status_msg", "")).lower()
+    except (ValueError, AttributeError):
+        return False
+    return any(text in message for text in RATE_LIMIT_MESSAGES)
+
+
+class TokenBucket:
+    """Токен-бакет: ``rate_per_hour`` токенов в час, не более ``burst`` подряд.
+
+    Нулевая скорость отключает ограничение.
+    """
+
+    def __init__(self, rate_per_hour: float, burst: int) -> None:
+        self.rate = rate_per_hour / 3600
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+
+    def wait_time(self, now: float) -> float:
+        """Сколько секунд ждать до следующего токена."""
+        blocked = max(0.0, self.blocked_until - now)
+        if self.rate <= 0:
+            return blocked
+        self._refill(now)
+        if self.tokens >= 1:
+            return blocked
+        return max(blocked, (1 - self.tokens) / self.rate)
+
+    def consume(self) -> None:
+        if self.rate > 0:
+            self.tokens -= 1
+
+
+class RateLimiter:
+    """Бакеты на каждый аккаунт и на каждый датацентр.
+
+    Публикация забирает по токену из бакета аккаунта и бакета его
+    датацентра одновременно. Штраф после ответа "posting too fast"
+    блокирует только бакет этого аккаунта.
+    """
+
+    def __init__(
+        self,
+        account_rate: float = 0,
+        account_burst: int = 1,
+        dc_rate: float = 0,
+        dc_burst: int = 1,
+    ) -> None:
+        self.account_rate = account_rate
+        self.account_burst = account_burst
+        self.dc_rate = dc_rate
+        self.dc_burst = dc_burst
+        self._accounts: Dict[str, TokenBucket] = {}
+        self._dcs: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls) -> "RateLimiter":
+        config = Config.get()
+        return cls(
+            config.publish_rate_per_hour, config.publish_burst,
+            config.dc_publish_rate_per_hour, config.dc_publish_burst,
+        )
+
+    def _buckets(self, account: str, dc: str | None) -> Tuple[TokenBucket, TokenBucket]:
+        account_bucket = self._accounts.get(account)
+        if account_bucket is None:
+            account_bucket = self._accounts[account] = TokenBucket(self.account_rate, self.account_burst)
+        dc_key = dc or ""
+        dc_bucket = self._dcs.get(dc_key)
+        if dc_bucket is None:
+            dc_bucket = self._dcs[dc_key] = TokenBucket(self.dc_rate, self.dc_burst)
+        return account_bucket, dc_bucket
+
+    def try_acquire(self, account: str, dc: str | None) -> float:
+        """Забирает токены и возвращает 0 или время ожидания без списания."""
+        with self._lock:
+            account_bucket, dc_bucket = self._buckets(account, dc)
+            now = time.monotonic()
+            wait = max(account_bucket.wait_time(now), dc_bucket.wait_time(now))
+            if wait > 0:
+                return wait
+            account_bucket.consume()
+            dc_bucket.consume()
+            return 0.0
+
+    def penalize(self, account: str, seconds: float) -> None:
+        """Блокирует публикации аккаунта на ``seconds`` секунд."""
+        with self._lock:
+            bucket, _ = self._buckets(account, None)
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + seconds)
+
+
+def get_limiter() -> RateLimiter:
+    """Общий для процесса ограничитель, настроенный из конфигурации."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter.from_config()
+        return _limiter
+
+
+class PublishQueue:
+    """Очередь шагов публикации с отложенным повтором.
+
+    Шаг - функция, которая возвращает True/False или None, если TikTok
+    ответил "posting too fast". Такой шаг возвращается в очередь после
+    задержки, а загруженные байты при этом не отправляются заново.
+    Пока один аккаунт ждёт, публикуются остальные.
+    """
+
+    def __init__(self, limiter: RateLimiter | None = None, max_deferrals: int | None = None, backoff: float | None = None) -> None:
+        config = Config.get()
+        self.limiter = limiter or get_limiter()
+        self.max_deferrals = config.publish_max_deferrals if max_deferrals is None else max_deferrals
+        self.backoff = config.publish_backoff if backoff is None else backoff
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+
+    def add(self, key: Hashable, account: str, dc: str | None, post: Callable[[], bool | None]) -> None:
+        heapq.heappush(self._heap, (time.monotonic(), next(self._seq), key, account, dc, 0, post))
+
+    def run(self) -> Dict[Hashable, bool]:
+        results: Dict[Hashable, bool] = {}
+        while self._heap:
+            ready_at, seq, key, account, dc, deferrals, post = heapq.heappop(self._heap)
+            now = time.monotonic()
+            wait = max(ready_at - now, self.limiter.try_acquire(account, dc) if ready_at <= now else 0)
+            if wait > 0:
+                heapq.heappush(self._heap, (now + wait, seq, key, account, dc, deferrals, post))
+                time.sleep(max(0.0, self._heap[0][0] - now))
+                continue
+
+            outcome = post()
+            if outcome is not None:
+                results[key] = outcome
+            elif deferrals >= self.max_deferrals:
+                print("[-] Слишком частые публикации, попытки исчерпаны")
+                results[key] = False
+            else:
+                delay = self.backoff * 2 ** deferrals * random.uniform(1, 1.5)
+                print(f"[-] Слишком частые публикации, повтор через {int(delay)} с")
+                self.limiter.penalize(account, delay)
+                heapq.heappush(self._heap, (now + delay, seq, key, account, dc, deferrals + 1, post))
+        return results
@@ -0,0 +1,72 @@
+"""Повторные попытки запросов загрузки."""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from typing import Callable
+
+import requests
+
+from ..config.settings import Config
+
+RETRY_STATUSES = (408, 429)
+MAX_DELAY = 30.0
+
+
+class RetryPolicy:
+    """Экспоненциальная задержка с джиттером и общим бюджетом повторов.
+
+    Один экземпляр создаётся на загрузку: ``budget`` ограничивает общее
+    число повторов по всем частям и этапам, ``attempts`` - число попыток
+    одного запроса. Повторяются ошибки соединения, 408, 429 и 5xx.
+    """
+
+    def __init__(self, budget: int | None = None, attempts: int | None = None, delay: float | None = None) -> None:
+        config = Config.get()
+        self.budget = config.upload_retry_budget if budget is None else budget
+        self.attempts = max(1, attempts or config.upload_part_attempts)
+        self.delay = config.upload_retry_delay if delay is None else delay
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt: int) -> float:
+        """Задержка перед попыткой ``attempt`` (с единицы), full jitter."""
+        return random.uniform(0, min(MAX_DELAY, self.delay * 2 ** (attempt - 1)))
+
+    def _take(self) -> bool:
+        with self._lock:
+            if self.budget <= 0:
+                return False
+            self.budget -= 1
+            return True
+
+    def run(
+        self,
+        send: Callable[[], requests.Response],
+        before_retry: Callable[[], bool] | None = None,
+    ) -> requests.Response | None:
+        """Выполняет ``send`` с повторами.
+
+        Возвращает последний ответ или None, если ответа не было.
+        ``before_retry`` вызывается перед каждым повтором и может отменить его.
+        """
+        r = None
+        for attempt in range(self.attempts):
+            if attempt:
+                if not self._take():
+                    print("[-] Исчерпан бюджет повторных попыток")
+                    break
+                time.sleep(self.backoff(attempt))
+                if before_retry is not None and not before_retry():
+                    return None
+            try:
+                r = send()
+            except requests.RequestException as e:
+                print(f"[-] Ошибка соединения: {e}")
+                r = None
+                continue
+            if r.status_code not in RETRY_STATUSES and r.status_code < 500:
+                return r
+            print(f"[-] Сервер ответил {r.status_code}, повтор...")
+        return r
@@ -0,0 +1,105 @@
+"""Адаптивный размер частей загрузки."""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Dict
+
+from ..config.settings import Config
+from .metrics import proxy_label
+
+_ALIGN = 262144
+_STATE_FILE = "part_sizes.json"
+_state_lock = threading.Lock()
+
+
+def _load_sizes() -> Dict[str, int]:
+    path = Config.get().state_path(_STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class PartSizer:
+    """Подбирает размер следующей части по измеренной скорости канала.
+
+    Размер стремится к тому, чтобы одна часть уходила примерно за
+    ``UPLOAD_PART_SECONDS`` секунд, и меняется не более чем в два раза за
+    шаг. Неудачная часть уменьшает размер вдвое. Выбранный размер
+    запоминается для пары прокси/хост загрузки в ``STATE_DIR``.
+    """
+
+    def __init__(
+        self,
+        key: str | None = None,
+        initial: int | None = None,
+        minimum: int | None = None,
+        maximum: int | None = None,
+        target_seconds: float | None = None,
+    ) -> None:
+        config = Config.get()
+        self.key = key
+        self.minimum = minimum or config.upload_min_part_size
+        self.maximum = maximum or config.upload_max_part_size
+        self.target_seconds = target_seconds or config.upload_part_seconds
+        if initial is None and key is not None:
+            initial = _load_sizes().get(key)
+        self._size = self._clamp(initial or config.upload_part_size)
+        self._throughput: float | None = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def fixed(cls, size: int) -> "PartSizer":
+        """Политика с постоянным размером части."""
+        return cls(initial=size, minimum=size, maximum=size)
+
+    @classmethod
+    def for_route(cls, proxy: str | None, upload_host: str) -> "PartSizer":
+        """Политика для пары прокси/хост, начиная с сохранённого размера.
+
+        Логин и пароль прокси в ключ, а значит и в файл состояния, не попадают.
+        """
+        return cls(key=f"{proxy_label(proxy) or 'direct'}|{upload_host}")
+
+    def _clamp(self, size: float) -> int:
+        size = int(size) // _ALIGN * _ALIGN or _ALIGN
+        return max(self.minimum, min(self.maximum, size))
+
+    def next_size(self) -> int:
+        with self._lock:
+            return self._size
+
+    def observe(self, nbytes: int, seconds: float, ok: bool) -> None:
+        """Учитывает результат отправки части."""
+        with self._lock:
+            if not ok:
+                self._size = self._clamp(self._size / 2)
+                return
+            throughput = nbytes / max(seconds, 1e-3)
+            # Smooth the measurement so one lucky or unlucky part does not swing the size.
+            if self._throughput is None:
+                self._throughput = throughput
+            else:
+                self._throughput = 0.7 * self._throughput + 0.3 * throughput
+            wanted = self._throughput * self.target_seconds
+            wanted = min(max(wanted, self._size / 2), self._size * 2)
+            self._size = self._clamp(wanted)
+
+    def save(self) -> None:
+        """Запоминает текущий размер для следующих загрузок."""
+        if self.key is None or self.minimum == self.maximum:
+            return
+        with _state_lock:
+            sizes = _load_sizes()
+            sizes[self.key] = self.next_size()
+            path = Config.get().state_path(_STATE_FILE)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(sizes, f)
+            os.replace(tmp_path, path)
@@ -3,8 +3,10 @@
 from __future__ import annotations
 
 import datetime
+import functools
 import hashlib
 import hmac
+import itertools
 import json
 import os
 import random
@@ -15,18 +17,26 @@ import sys
 import time
 import uuid
 import zlib
-from typing import Any
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List
 
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 from fake_useragent import FakeUserAgentError, UserAgent
 from requests_auth_aws_sigv4 import AWSSigV4
 
-from ..utils.cookies import load_cookies_from_file
-from ..core.browser import Browser
+from ..utils.cookies import SESSION_PREFIX, get_cookie_store, load_cookies_from_file
 from ..utils.bot_utils import *
+from ..utils.signer import sign_batch, sign_url
 from ..config.settings import Config
-from ..core.video import Video
+from ..core.probe import validate_upload
+from . import metrics
+from .journal import UploadJournal
+from .retry import RetryPolicy
+from .parts import PartReader, get_manifest
+from .ratelimit import PublishQueue, is_rate_limited
+from .sizing import PartSizer
 from ..utils.basics import eprint
 
 
@@ -35,6 +45,9 @@ load_dotenv()
 
 # Constants
 _UA = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/68.0.3440.106 Safari/537.36'
+# url = f"https://www.tiktok.com/api/v1/web/project/post/"
+PUBLISH_URL = "https://www.tiktok.com/tiktok/web/project/post/v1/"
+_TARGET_KEYS = ("video_token", "video_id", "store_uri", "video_auth", "upload_host", "session_key", "upload_id")
 
 
 def login(login_name: str) -> str:
@@ -48,6 +61,8 @@ def login(login_name: str) -> str:
         print("Повторный вход не требуется, сессия уже сохранена!")
         return session_cookie["value"]
 
+    from ..core.browser import Browser
+
     browser = Browser.get()
     browser.driver.get(os.getenv("TIKTOK_LOGIN_URL"))
 
@@ -67,44 +82,33 @@ def login(login_name: str) -> str:
     return cookie_name.get("value", "") if cookie_name else ""
 
 
-# Local Code...
-def upload_video(
-    session_user: str,
-    video: str,
-    title: str,
-    schedule_time: int = 0,
-    allow_comment: int = 1,
-    allow_duet: int = 0,
-    allow_stitch: int = 0,
-    visibility_type: int = 0,
-    brand_organic_type: int = 0,
-    branded_content_type: int = 0,
-    ai_label: int = 0,
-    proxy: str | None = None,
-) -> bool:
-    """Загрузка видео на TikTok."""
-
+def _random_user_agent() -> str:
     try:
-        user_agent = UserAgent().random
+        return UserAgent().random
     except FakeUserAgentError:
-        user_agent = _UA
         print("[-] Не удалось получить случайный User-Agent, используется стандартный")
+        return _UA
 
+
+def _load_session(session_user: str) -> tuple[str, str] | None:
+    """Возвращает sessionid и датацентр сохранённого аккаунта или None без входа."""
     cookies = load_cookies_from_file(f"tiktok_session-{session_user}")
     session_id = next((c["value"] for c in cookies if c["name"] == "sessionid"), None)
     dc_id = next((c["value"] for c in cookies if c["name"] == "tt-target-idc"), None)
-    
+
     if not session_id:
         eprint("Не найден cookie с идентификатором сессии. Выполните вход.")
-        sys.exit(1)
+        return None
     if not dc_id:
         print("[ВНИМАНИЕ]: выполните вход для получения идентификатора датацентра")
         dc_id = "useast2a"
     print("Пользователь успешно авторизован.")
     print(f"Датацентр TikTok: {dc_id}")
-    
-    print("Загрузка видео...")
-    # Parameter validation
+    return session_id, dc_id
+
+
+def _check_upload_params(schedule_time: int, title: str, visibility_type: int) -> bool:
+    """Проверка параметров публикации."""
     if schedule_time and (schedule_time > 864000 or schedule_time < 900):
         print("[-] Нельзя планировать видео более чем на 10 дней или менее чем через 20 минут")
         return False
@@ -114,14 +118,98 @@ def upload_video(
     if schedule_time != 0 and visibility_type == 1:
         print("[-] Нельзя планировать приватные видео")
         return False
+    return True
+
+
+# Local Code...
+def upload_video(
+    session_user: str,
+    video: str,
+    title: str,
+    schedule_time: int = 0,
+    allow_comment: int = 1,
+    allow_duet: int = 0,
+    allow_stitch: int = 0,
+    visibility_type: int = 0,
+    brand_organic_type: int = 0,
+    branded_content_type: int = 0,
+    ai_label: int = 0,
+    proxy: str | None = None,
+    upload_concurrency: int | None = None,
+    resume: bool = True,
+) -> bool:
+    """Загрузка видео на TikTok.
+
+    ``upload_concurrency`` переопределяет ``UPLOAD_CONCURRENCY`` из конфигурации.
+    При ``resume`` прерванная загрузка продолжается с первой неподтверждённой
+    части, пока сохранённая сессия загрузки действительна.
+    """
+
+    metrics.setup()
+    user_agent = _random_user_agent()
+    loaded = _load_session(session_user)
+    if loaded is None:
+        sys.exit(1)
+    session_id, dc_id = loaded
+
+    print("Загрузка видео...")
+    if not _check_upload_params(schedule_time, title, visibility_type):
+        return False
 
-    # Check video length - 1 minute max, takes too long to run this.
+    # Duration, size and format come from cached container metadata, no network call is made for a bad file.
+    problems = validate_upload(os.path.join(os.getcwd(), Config.get().videos_dir, video))
+    if problems:
+        print("[-] Видео нельзя загрузить: " + "; ".join(problems))
+        return False
 
     # Creating Session
+    upload_concurrency = max(1, upload_concurrency or Config.get().upload_concurrency)
+    session = _open_session(session_id, dc_id, user_agent, proxy, upload_concurrency)
+    metrics.bind(session, session_user, dc_id, proxy)
+    # The signature depends only on msToken and the user agent, so it is made while the parts upload.
+    background = ThreadPoolExecutor(max_workers=1)
+    signing = background.submit(prepare_signature, session, user_agent)
+    try:
+        journal = UploadJournal.open(session_user, os.path.join(os.getcwd(), Config.get().videos_dir, video)) if resume else None
+        project = create_project(session, journal)
+        if not project:
+            return False
+        creation_id, project_id = project
+
+        retry = RetryPolicy()
+        if journal and journal.get("finished"):
+            # The parts were finished and committed before, only the post is left.
+            acked = journal.acked_parts
+            upload_result = _upload_result({key: journal.get(key) for key in _TARGET_KEYS}, [acked[n] for n in sorted(acked)])
+        else:
+            upload_result = upload_to_tiktok(video, session, upload_concurrency, journal, retry=retry)
+        if not upload_result and journal and journal.resumed:
+            # The saved upload session is no longer accepted, start over with a fresh project.
+            print("[-] Сохранённая сессия загрузки недействительна, загрузка начнётся заново")
+            journal.discard()
+            project = create_project(session, journal)
+            if not project:
+                return False
+            creation_id, project_id = project
+            upload_result = upload_to_tiktok(video, session, upload_concurrency, journal, retry=retry)
+        if not upload_result:
+            print("[-] Не удалось загрузить файл видео")
+            return False
+
+        return publish_upload(session, user_agent, creation_id, upload_result, title, schedule_time, journal, retry, session_user, signing)
+    finally:
+        background.shutdown(wait=False)
+        metrics.flush()
+
+
+def _open_session(session_id: str, dc_id: str, user_agent: str, proxy: str | None, pool_size: int) -> requests.Session:
+    """HTTP-сессия аккаунта с cookie, заголовками и прокси."""
     session = requests.Session()
     session.cookies.set("sessionid", session_id, domain=".tiktok.com")
     session.cookies.set("tt-target-idc", dc_id, domain=".tiktok.com")
     session.verify = True
+    # Parallel part uploads share this session, so keep enough pooled connections for all of them.
+    session.mount("https://", HTTPAdapter(pool_maxsize=max(10, pool_size)))
 
     headers = {
         'User-Agent': user_agent,
@@ -135,17 +223,66 @@ def upload_video(
             "http": proxy,
             "https": proxy,
         }
+    return session
 
-    creation_id = generate_random_string(21, True)
-    project_url = f"https://www.tiktok.com/api/v1/web/project/create/?creation_id={creation_id}&type=1&aid=1988"
-    r = session.post(project_url)
 
-    if not assert_success(project_url, r):
+def publish_upload(
+    session: requests.Session,
+    user_agent: str,
+    creation_id: str,
+    upload_result: tuple,
+    title: str,
+    schedule_time: int = 0,
+    journal: UploadJournal | None = None,
+    retry: RetryPolicy | None = None,
+    account: str | None = None,
+    signing: Future | None = None,
+) -> bool:
+    """Завершает загрузку частей и публикует видео.
+
+    Запросы phase=finish и CommitUploadInner повторяются по ``retry``.
+    Публикация проходит через ``PublishQueue``: при ответе "posting too fast"
+    повторяется только project/post, загруженные части не отправляются заново.
+    ``account`` - имя аккаунта для ограничителя частоты публикаций,
+    ``signing`` - фоновый ``prepare_signature``, запущенный до загрузки частей.
+    """
+    prepared = [signing.result()] if signing is not None else [None]
+    data = finalize_upload(
+        session, user_agent, creation_id, upload_result, title, schedule_time, journal, retry,
+        fetch_mstoken=prepared[0] is None,
+    )
+    if data is None:
         return False
 
-    # get project_id
-    project_id = r.json()["project"]["project_id"]
-    video_id, session_key, upload_id, crcs, upload_host, store_uri, video_auth, aws_auth = upload_to_tiktok(video, session)
+    def post() -> bool | None:
+        # The prepared signature is used once, a deferred post signs again.
+        return post_video(session, user_agent, data, schedule_time, prepared.pop() if prepared else None)
+
+    queue = PublishQueue()
+    queue.add(creation_id, account or creation_id, session.cookies.get("tt-target-idc"), post)
+    published = queue.run()[creation_id]
+    if published and journal:
+        journal.discard()
+    return published
+
+
+def finalize_upload(
+    session: requests.Session,
+    user_agent: str,
+    creation_id: str,
+    upload_result: tuple,
+    title: str,
+    schedule_time: int = 0,
+    journal: UploadJournal | None = None,
+    retry: RetryPolicy | None = None,
+    fetch_mstoken: bool = True,
+) -> dict | None:
+    """Завершает загрузку частей и возвращает тело запроса project/post.
+
+    Без ``fetch_mstoken`` msToken считается уже полученным ``prepare_signature``.
+    """
+    retry = retry or RetryPolicy()
+    video_id, session_key, upload_id, crcs, upload_host, store_uri, video_auth, aws_auth = upload_result
 
     url = f"https://{upload_host}/{store_uri}?uploadID={upload_id}&phase=finish&uploadmode=part"
     headers = {
@@ -154,40 +291,40 @@ def upload_video(
     }
     data = ",".join([f"{i + 1}:{crcs[i]}" for i in range(len(crcs))])
 
-    if proxy:
-        r = requests.post(url, headers=headers, data=data, proxies=session.proxies)
-        if not assert_success(url, r):
-            return False
-    else:
-        r = requests.post(url, headers=headers, data=data)
-        if not assert_success(url, r):
-            return False
+    def finish() -> requests.Response:
+        with metrics.timer("finish", session):
+            if session.proxies:
+                return requests.post(url, headers=headers, data=data, proxies=session.proxies)
+            return requests.post(url, headers=headers, data=data)
 
     # url = f"https://www.tiktok.com/top/v1?Action=CommitUploadInner&Version=2020-11-19&SpaceName=tiktok"
     # data = '{"SessionKey":"' + session_key + '","Functions":[{"name":"GetMeta"}]}'
 
-    # ApplyUploadInner
-    url = f"https://www.tiktok.com/top/v1?Action=CommitUploadInner&Version=2020-11-19&SpaceName=tiktok"
-    data = '{"SessionKey":"' + session_key + '","Functions":[{"name":"GetMeta"}]}'
-
-    r = session.post(url, auth=aws_auth, data=data)
-    if not assert_success(url, r):
-        return False
+    def commit() -> requests.Response:
+        with metrics.timer("commit", session):
+            return session.post(url, auth=aws_auth, data=data)
+
+    # A finished upload cannot be finished again, a resumed journal goes straight to the post.
+    if not (journal and journal.get("finished")):
+        r = retry.run(finish)
+        if r is None or not assert_success(url, r):
+            if journal:
+                journal.discard()
+            return None
+
+        # ApplyUploadInner
+        url = f"https://www.tiktok.com/top/v1?Action=CommitUploadInner&Version=2020-11-19&SpaceName=tiktok"
+        data = '{"SessionKey":"' + session_key + '","Functions":[{"name":"GetMeta"}]}'
+        r = retry.run(commit)
+        if r is None or not assert_success(url, r):
+            return None
+        if journal:
+            journal.update(finished=True)
 
     # publish video
-    url = "https://www.tiktok.com"
-    headers = {
-        "user-agent": user_agent,
-    }
+    if fetch_mstoken and not _fetch_mstoken(session, user_agent):
+        return None
 
-    r = session.head(url, headers=headers)
-    if not assert_success(url, r):
-        return False
-
-    headers = {
-        "content-type": "application/json",
-        "user-agent": user_agent,
-    }
     brand = ""
 
     if brand and brand[-1] == ",":
@@ -275,6 +412,112 @@ def upload_video(
     # }
 
 
+    return _build_post_data(creation_id, video_id, title, text_extra, schedule_time)
+
+
+def _fetch_mstoken(session: requests.Session, user_agent: str) -> bool:
+    """HEAD на tiktok.com, который выставляет cookie msToken."""
+    url = "https://www.tiktok.com"
+    headers = {
+        "user-agent": user_agent,
+    }
+
+    with metrics.timer("mstoken", session):
+        r = session.head(url, headers=headers)
+    return assert_success(url, r)
+
+
+def prepare_signature(session: requests.Session, user_agent: str) -> tuple[str | None, dict] | None:
+    """Получает msToken и подписывает URL публикации.
+
+    Подпись зависит только от msToken и User-Agent, поэтому её можно
+    сделать параллельно с загрузкой частей. Возвращает (msToken, подпись)
+    или None, тогда подпись будет сделана перед публикацией. Любая ошибка
+    здесь не прерывает загрузку, а тоже даёт None.
+    """
+    try:
+        if not _fetch_mstoken(session, user_agent):
+            return None
+        mstoken = session.cookies.get("msToken")
+        with metrics.timer("sign", session):
+            tt_output = sign_url(_signature_url(mstoken), user_agent)
+    except requests.RequestException as e:
+        print(f"[-] Ошибка соединения: {e}")
+        return None
+    except Exception as e:
+        # Signer failures (node missing, bad JSON, ...) fall back to signing before the post.
+        print(f"[-] Не удалось подписать запрос заранее: {e}")
+        return None
+    return (mstoken, tt_output) if tt_output is not None else None
+
+
+def post_video(
+    session: requests.Session,
+    user_agent: str,
+    data: dict,
+    schedule_time: int = 0,
+    signed: tuple[str | None, dict] | None = None,
+) -> bool | None:
+    """Подписывает и отправляет project/post.
+
+    ``signed`` - готовая подпись и msToken, с которым она сделана
+    (``prepare_signature`` или ``sign_batch``).
+    Возвращает None, если TikTok ограничил частоту публикаций и запрос
+    нужно повторить позже.
+    """
+    headers = {
+        "content-type": "application/json",
+        "user-agent": user_agent,
+    }
+    if signed is not None:
+        mstoken, tt_output = signed
+    else:
+        mstoken, tt_output = session.cookies.get("msToken"), None
+    # xbogus = subprocess_jsvmp(os.path.join(os.getcwd(), "tiktok_uploader", "./x-bogus.js"), user_agent, f"app_name=tiktok_web&channel=tiktok_web&device_platform=web&aid=1988&msToken={mstoken}")
+    # /tiktok/web/project/post/v1/
+    if tt_output is None:
+        with metrics.timer("sign", session):
+            tt_output = sign_url(_signature_url(mstoken), user_agent)
+        if tt_output is None:
+            return False
+
+    url = PUBLISH_URL
+    with metrics.timer("post", session):
+        r = session.request("POST", url, params=_post_params(mstoken, tt_output), data=json.dumps(data), headers=headers)
+    if is_rate_limited(r):
+        return None
+    if not assert_success(url, r):
+        print("[-] Published failed, try later again")
+        return False
+
+    if r.json()["status_code"] != 0:
+        print("[-] Publish failed to Tiktok")
+        print_error(url, r)
+        return False
+    print(f"Published successfully {'| Scheduled for ' + str(schedule_time) if schedule_time else ''}")
+    return True
+    # Check if video uploaded successfully (Tiktok has changed endpoint for this)
+    # url = f"https://www.tiktok.com/api/v1/web/project/list/?aid=1988"
+    #
+    # r = session.get(url)
+    # if not assert_success(url, r):
+    #   return False
+    # # print(r.json()["infos"])
+    # for j in r.json()["infos"]:
+    #   try:
+    #       if j["creationID"] == creation_id:
+    #           if j["tasks"][0]["status_msg"] == "Y project task init" or j["tasks"][0]["status_msg"] == "Success":
+    #               print("[+] Video uploaded successfully.")
+    #               return True
+    #           print(f"[-] Video could not be uploaded: {j['tasks'][0]['status_msg']}")
+    #           return False
+    #   except KeyError:
+    #       print("[-] Video could not be uploaded")
+    #       print("Response ", j)
+
+
+def _build_post_data(creation_id: str, video_id: str, title: str, text_extra: list, schedule_time: int) -> dict:
+    """Тело запроса project/post."""
     data = {
         "post_common_info": {
             "creation_id": creation_id,
@@ -317,145 +560,388 @@ def upload_video(
         ]
     }
 
-
     # Add schedule_time to the payload if it's provided
     if schedule_time > 0:
         data["feature_common_info_list"][0]["schedule_time"] = schedule_time + int(time.time())
-    
-    uploaded = False
-    while True:
-        mstoken = session.cookies.get("msToken")
-        # xbogus = subprocess_jsvmp(os.path.join(os.getcwd(), "tiktok_uploader", "./x-bogus.js"), user_agent, f"app_name=tiktok_web&channel=tiktok_web&device_platform=web&aid=1988&msToken={mstoken}")
-        # /tiktok/web/project/post/v1/
-        js_path = os.path.join(os.getcwd(), "tiktok_uploader", "tiktok-signature", "browser.js")
-        sig_url = f"https://www.tiktok.com/api/v1/web/project/post/?app_name=tiktok_web&channel=tiktok_web&device_platform=web&aid=1988&msToken={mstoken}"
-        signatures = subprocess_jsvmp(js_path, user_agent, sig_url)
-        if signatures is None:
-            print("[-] Failed to generate signatures")
-            return False
+    return data
 
-        try:
-            tt_output = json.loads(signatures)["data"]
-        except (json.JSONDecodeError, KeyError) as e:
-            print(f"[-] Failed to parse signature data: {str(e)}")
-            return False
 
-        project_post_dict = {
-            "app_name": "tiktok_web",
-            "channel": "tiktok_web",
-            "device_platform": "web",
-            "aid": 1988,
-            "msToken": mstoken,
-            "X-Bogus": tt_output["x-bogus"],
-            "_signature": tt_output["signature"],
-            # "X-TT-Params": tt_output["x-tt-params"],  # not needed rn.
-        }
+def _signature_url(mstoken: str | None) -> str:
+    """URL, для которого генерируются X-Bogus и _signature."""
+    return f"https://www.tiktok.com/api/v1/web/project/post/?app_name=tiktok_web&channel=tiktok_web&device_platform=web&aid=1988&msToken={mstoken}"
 
-        # url = f"https://www.tiktok.com/api/v1/web/project/post/"
-        url = f"https://www.tiktok.com/tiktok/web/project/post/v1/"
-        r = session.request("POST", url, params=project_post_dict, data=json.dumps(data), headers=headers)
-        if not assertSuccess(url, r):
-            print("[-] Published failed, try later again")
-            printError(url, r)
-            return False
 
-        if r.json()["status_code"] == 0:
-            print(f"Published successfully {'| Scheduled for ' + str(schedule_time) if schedule_time else ''}")
-            uploaded = True
-            break
-        else:
-            print("[-] Publish failed to Tiktok, trying again...")
-            printError(url, r)
+def _post_params(mstoken: str | None, tt_output: dict) -> dict:
+    """Параметры запроса project/post с подписями."""
+    return {
+        "app_name": "tiktok_web",
+        "channel": "tiktok_web",
+        "device_platform": "web",
+        "aid": 1988,
+        "msToken": mstoken,
+        "X-Bogus": tt_output["x-bogus"],
+        "_signature": tt_output["signature"],
+        # "X-TT-Params": tt_output["x-tt-params"],  # not needed rn.
+    }
+
+
+def create_project(session: requests.Session, journal: UploadJournal | None = None) -> tuple[str, str] | None:
+    """Создаёт проект публикации или берёт его из журнала."""
+    if journal and journal.get("project_id"):
+        print("Продолжение прерванной загрузки...")
+        return journal.get("creation_id"), journal.get("project_id")
+
+    creation_id = generate_random_string(21, True)
+    project_url = f"https://www.tiktok.com/api/v1/web/project/create/?creation_id={creation_id}&type=1&aid=1988"
+    with metrics.timer("project_create", session):
+        r = session.post(project_url)
+
+    if not assert_success(project_url, r):
+        return None
+
+    # get project_id
+    project_id = r.json()["project"]["project_id"]
+    if journal:
+        journal.update(creation_id=creation_id, project_id=project_id)
+    return creation_id, project_id
+
+
+def transfer_part(
+    session: requests.Session,
+    upload_host: str,
+    store_uri: str,
+    upload_id: str,
+    video_auth: str,
+    part_number: int,
+    chunk: bytes,
+    crc: str,
+    retry: RetryPolicy | None = None,
+    reread: Callable[[], bytes] | None = None,
+    sizer: PartSizer | None = None,
+) -> bool:
+    """Отправляет одну часть видео и проверяет ответ сервера.
+
+    Перед каждым повтором часть перечитывается через ``reread`` и её CRC
+    сверяется с исходным, чтобы не отправить изменившийся файл. В
+    ``sizer`` попадает время только последней попытки, без неудачных
+    попыток и пауз между ними.
+    """
+    url = f"https://{upload_host}/{store_uri}?partNumber={part_number}&uploadID={upload_id}&phase=transfer"
+    headers = {
+        "Authorization": video_auth,
+        "Content-Type": "application/octet-stream",
+        "Content-Disposition": 'attachment; filename="undefined"',
+        "Content-Crc32": crc,
+    }
+
+    elapsed = 0.0
+
+    def send() -> requests.Response:
+        nonlocal elapsed
+        started = time.perf_counter()
+        with metrics.timer("transfer", session):
+            r = session.post(url, headers=headers, data=chunk)
+        elapsed = time.perf_counter() - started
+        metrics.observe_transfer(session, len(chunk), elapsed)
+        return r
+
+    def before_retry() -> bool:
+        nonlocal chunk
+        if reread is None:
+            return True
+        chunk = reread()
+        if crc32(chunk) != crc:
+            print(f"[-] Часть {part_number} изменилась на диске, повтор невозможен")
             return False
-        #
-        # try:
-        #   if r.json()["status_msg"] == "You are posting too fast. Take a rest.":
-        #       print("[-] You are posting too fast, try later again")
-        #       return False
-        #   print(r.json())
-        #   uploaded = True
-        #   break
-        # except Exception as e:
-        #   print("[-] Waiting for TikTok to process video...")
-        #   time.sleep(1.5)  # wait 1.5 seconds before asking again.
-    if not uploaded:
-        print("[-] Could not upload video")
-        return False
-    # Check if video uploaded successfully (Tiktok has changed endpoint for this)
-    # url = f"https://www.tiktok.com/api/v1/web/project/list/?aid=1988"
-    #
-    # r = session.get(url)
-    # if not assert_success(url, r):
-    #   return False
-    # # print(r.json()["infos"])
-    # for j in r.json()["infos"]:
-    #   try:
-    #       if j["creationID"] == creation_id:
-    #           if j["tasks"][0]["status_msg"] == "Y project task init" or j["tasks"][0]["status_msg"] == "Success":
-    #               print("[+] Video uploaded successfully.")
-    #               return True
-    #           print(f"[-] Video could not be uploaded: {j['tasks'][0]['status_msg']}")
-    #           return False
-    #   except KeyError:
-    #       print("[-] Video could not be uploaded")
-    #       print("Response ", j)
+        return True
 
+    r = (retry or RetryPolicy(attempts=1)).run(send, before_retry)
+    ok = r is not None and _part_accepted(url, r, part_number, crc)
+    if sizer is not None:
+        sizer.observe(len(chunk), elapsed, ok)
+    return ok
 
-def upload_to_tiktok(video_file: str, session: requests.Session) -> tuple:
-    """Загружает файл на сервер TikTok."""
-    url = "https://www.tiktok.com/api/v1/video/upload/auth/?aid=1988"
-    r = session.get(url)
+
+def _part_accepted(url: str, r: requests.Response, part_number: int, crc: str) -> bool:
     if not assert_success(url, r):
         return False
+    try:
+        server_crc = r.json()["data"]["crc32"]
+    except (ValueError, KeyError, TypeError):
+        return True
+    if server_crc and server_crc != crc:
+        print(f"[-] Часть {part_number}: CRC не совпадает ({server_crc} != {crc})")
+        return False
+    return True
+
 
-    aws_auth = AWSSigV4(
+def _aws_auth(video_token: dict) -> AWSSigV4:
+    return AWSSigV4(
         "vod",
         region="ap-singapore-1",
-        aws_access_key_id=r.json()["video_token_v5"]["access_key_id"],
-        aws_secret_access_key=r.json()["video_token_v5"]["secret_acess_key"],
-        aws_session_token=r.json()["video_token_v5"]["session_token"],
+        aws_access_key_id=video_token["access_key_id"],
+        aws_secret_access_key=video_token["secret_acess_key"],
+        aws_session_token=video_token["session_token"],
     )
-    with open(os.path.join(os.getcwd(), Config.get().videos_dir, video_file), "rb") as f:
-        video_content = f.read()
-    file_size = len(video_content)
-    url = f"https://www.tiktok.com/top/v1?Action=ApplyUploadInner&Version=2020-11-19&SpaceName=tiktok&FileType=video&IsInner=1&FileSize={file_size}&s=g158iqx8434"
 
-    r = session.get(url, auth=aws_auth)
+
+def apply_upload(session: requests.Session, file_size: int) -> dict | None:
+    """Получает адрес загрузки (upload/auth и ApplyUploadInner).
+
+    Возвращает ``video_token``, ``video_id``, ``store_uri``, ``video_auth``,
+    ``upload_host``, ``session_key`` и новый ``upload_id``.
+    """
+    url = "https://www.tiktok.com/api/v1/video/upload/auth/?aid=1988"
+    with metrics.timer("upload_auth", session):
+        r = session.get(url)
     if not assert_success(url, r):
-        return False
+        return None
+    video_token = {k: r.json()["video_token_v5"][k] for k in ("access_key_id", "secret_acess_key", "session_token")}
+
+    url = f"https://www.tiktok.com/top/v1?Action=ApplyUploadInner&Version=2020-11-19&SpaceName=tiktok&FileType=video&IsInner=1&FileSize={file_size}&s=g158iqx8434"
+    with metrics.timer("apply_upload", session):
+        r = session.get(url, auth=_aws_auth(video_token))
+    if not assert_success(url, r):
+        return None
 
-    # upload chunks
     upload_node = r.json()["Result"]["InnerUploadAddress"]["UploadNodes"][0]
-    video_id = upload_node["Vid"]
-    store_uri = upload_node["StoreInfos"][0]["StoreUri"]
-    video_auth = upload_node["StoreInfos"][0]["Auth"]
-    upload_host = upload_node["UploadHost"]
-    session_key = upload_node["SessionKey"]
-    chunk_size = 5242880
-    chunks = []
-    i = 0
-    while i < file_size:
-        chunks.append(video_content[i: i + chunk_size])
-        i += chunk_size
-    crcs = []
-    upload_id = str(uuid.uuid4())
-    for i in range(len(chunks)):
-        chunk = chunks[i]
-        crc = crc32(chunk)
-        crcs.append(crc)
-        url = f"https://{upload_host}/{store_uri}?partNumber={i + 1}&uploadID={upload_id}&phase=transfer"
-        headers = {
-            "Authorization": video_auth,
-            "Content-Type": "application/octet-stream",
-            "Content-Disposition": 'attachment; filename="undefined"',
-            "Content-Crc32": crc,
-        }
+    return {
+        "video_token": video_token,
+        "video_id": upload_node["Vid"],
+        "store_uri": upload_node["StoreInfos"][0]["StoreUri"],
+        "video_auth": upload_node["StoreInfos"][0]["Auth"],
+        "upload_host": upload_node["UploadHost"],
+        "session_key": upload_node["SessionKey"],
+        "upload_id": str(uuid.uuid4()),
+    }
 
-        r = session.post(url, headers=headers, data=chunk)
 
-    return video_id, session_key, upload_id, crcs, upload_host, store_uri, video_auth, aws_auth
+def _upload_result(target: dict, crcs: list) -> tuple:
+    """Кортеж, который ожидает ``publish_upload``."""
+    return (
+        target["video_id"], target["session_key"], target["upload_id"], crcs, target["upload_host"],
+        target["store_uri"], target["video_auth"], _aws_auth(target["video_token"]),
+    )
+
 
+def upload_to_tiktok(
+    video_file: str,
+    session: requests.Session,
+    concurrency: int | None = None,
+    journal: UploadJournal | None = None,
+    part_size: int | None = None,
+    retry: RetryPolicy | None = None,
+) -> tuple | bool:
+    """Загружает файл на сервер TikTok.
+
+    ``concurrency`` задаёт число частей, отправляемых параллельно; по умолчанию
+    берётся из ``UPLOAD_CONCURRENCY`` в конфигурации. Если передан ``journal``,
+    сессия загрузки и подтверждённые части берутся из него и не отправляются повторно.
+    Без ``part_size`` размер частей подбирается по скорости канала (см. ``PartSizer``).
+    Каждая часть повторяется отдельно по ``retry``.
+    """
+    retry = retry or RetryPolicy()
+    concurrency = max(1, concurrency or Config.get().upload_concurrency)
+    path = os.path.join(os.getcwd(), Config.get().videos_dir, video_file)
+    manifest = get_manifest(path)
+    with PartReader(path) as reader:
+        layout: Dict[int, tuple] = {}
+        acked: Dict[int, str] = {}
+        if journal and journal.resumed:
+            target = {key: journal.get(key) for key in _TARGET_KEYS}
+            layout = journal.layout
+            acked = {n: crc for n, crc in journal.acked_parts.items() if n in layout}
+            print(f"Подтверждено частей: {len(acked)} из {len(layout)} запланированных")
+        else:
+            target = apply_upload(session, reader.size)
+            if not target:
+                return False
+            if journal:
+                journal.update(created_at=time.time(), **target)
+
+        if part_size:
+            sizer = PartSizer.fixed(part_size)
+        else:
+            sizer = PartSizer.for_route(session.proxies.get("https"), target["upload_host"])
+
+        def plan() -> Iterator[tuple[int, int, int]]:
+            # Parts already planned in the journal keep their boundaries, new parts are sized on dispatch.
+            for part_number in sorted(layout):
+                yield (part_number, *layout[part_number])
+            part_number = max(layout, default=0)
+            offset = sum(size for _, size in layout.values())
+            while offset < reader.size:
+                size = min(sizer.next_size(), reader.size - offset)
+                part_number += 1
+                if journal:
+                    journal.plan_part(part_number, offset, size)
+                yield part_number, offset, size
+                offset += size
+
+        # Parts are read from disk inside the worker, so at most `concurrency` chunks are held in memory.
+        def send(part_number: int, offset: int, size: int) -> tuple[str, bool]:
+            if part_number in acked:
+                return acked[part_number], True
+            chunk = reader.read_range(offset, size)
+            crc = manifest.crc(offset, chunk)
+            ok = transfer_part(
+                session, target["upload_host"], target["store_uri"], target["upload_id"],
+                target["video_auth"], part_number, chunk, crc,
+                retry, lambda: reader.read_range(offset, size), sizer,
+            )
+            if ok and journal:
+                journal.ack_part(part_number, crc)
+            return crc, ok
+
+        crcs: Dict[int, str] = {}
+        if concurrency == 1:
+            for part_number, offset, size in plan():
+                crc, ok = send(part_number, offset, size)
+                if not ok:
+                    return False
+                crcs[part_number] = crc
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                in_flight = {}
+                parts = plan()
+                while True:
+                    # Keep exactly `concurrency` parts in flight so the next part is sized from fresh measurements.
+                    for part_number, offset, size in itertools.islice(parts, concurrency - len(in_flight)):
+                        in_flight[executor.submit(send, part_number, offset, size)] = part_number
+                    if not in_flight:
+                        break
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        part_number = in_flight.pop(future)
+                        crc, ok = future.result()
+                        if not ok:
+                            executor.shutdown(cancel_futures=True)
+                            return False
+                        crcs[part_number] = crc
+        sizer.save()
+
+    # The CRC list is assembled in part order for phase=finish.
+    return _upload_result(target, [crcs[n] for n in sorted(crcs)])
+
+
+def upload_video_fanout(
+    session_users: List[str],
+    video: str,
+    title: str,
+    schedule_time: int = 0,
+    allow_comment: int = 1,
+    allow_duet: int = 0,
+    allow_stitch: int = 0,
+    visibility_type: int = 0,
+    brand_organic_type: int = 0,
+    branded_content_type: int = 0,
+    ai_label: int = 0,
+    proxy: str | None = None,
+    upload_concurrency: int | None = None,
+) -> Dict[str, bool]:
+    """Загружает одно видео в несколько аккаунтов.
+
+    Каждая часть файла читается с диска и хешируется один раз, после чего
+    один и тот же буфер отправляется во все аккаунты параллельно. В памяти
+    держится не больше ``upload_concurrency`` частей: быстрый аккаунт может
+    уйти вперёд на это окно, дальше его сдерживает самый медленный.
+    Аккаунт без сохранённой сессии, с истёкшей по ``check_sessions``
+    сессией или с ошибкой загрузки получает False, остальные продолжают
+    работу. Прокси аккаунта из хранилища cookie важнее ``proxy``.
+    Возвращает результат публикации для каждого аккаунта.
+    """
+    metrics.setup()
+    results = {user: False for user in session_users}
+    print("Загрузка видео...")
+    if not _check_upload_params(schedule_time, title, visibility_type):
+        return results
+
+    path = os.path.join(os.getcwd(), Config.get().videos_dir, video)
+    problems = validate_upload(path)
+    if problems:
+        print("[-] Видео нельзя загрузить: " + "; ".join(problems))
+        return results
+    manifest = get_manifest(path)
+    workers = max(1, upload_concurrency or Config.get().upload_concurrency)
+    accounts = {}
+    try:
+        with PartReader(path, Config.get().upload_part_size) as reader:
+            store = get_cookie_store()
+            for user in session_users:
+                info = store.info(SESSION_PREFIX + user) or {}
+                if info.get("status") == "expired":
+                    print(f"[-] {user}: сессия истекла при последней проверке, выполните вход")
+                    continue
+                loaded = _load_session(user)
+                if loaded is None:
+                    print(f"[-] {user}: нет сохранённой сессии")
+                    continue
+                session_id, dc_id = loaded
+                user_agent = _random_user_agent()
+                account_proxy = info.get("proxy") or proxy
+                session = _open_session(session_id, dc_id, user_agent, account_proxy, workers)
+                metrics.bind(session, user, dc_id, account_proxy)
+                project = create_project(session)
+                target = apply_upload(session, reader.size) if project else None
+                if not target:
+                    print(f"[-] {user}: не удалось начать загрузку")
+                    continue
+                accounts[user] = (session, user_agent, project[0], target, RetryPolicy())
+
+            crcs = []
+            pending: Dict[int, Dict[str, Any]] = {}
+
+            def drain(index: int) -> None:
+                for user, future in pending.pop(index).items():
+                    if not future.result() and user in accounts:
+                        print(f"[-] {user}: не удалось загрузить часть {index + 1}")
+                        del accounts[user]
+
+            with ThreadPoolExecutor(max_workers=workers * max(1, len(accounts))) as executor:
+                for index in range(len(reader)):
+                    if not accounts:
+                        break
+                    chunk = reader.read(index)
+                    crc = manifest.crc(index * reader.part_size, chunk)
+                    crcs.append(crc)
+                    pending[index] = {
+                        user: executor.submit(
+                            transfer_part, session, target["upload_host"], target["store_uri"],
+                            target["upload_id"], target["video_auth"], index + 1, chunk, crc, retry,
+                        )
+                        for user, (session, _, _, target, retry) in accounts.items()
+                    }
+                    if len(pending) >= workers:
+                        drain(min(pending))
+                while pending:
+                    drain(min(pending))
+
+        ready = []
+        for user, (session, user_agent, creation_id, target, retry) in accounts.items():
+            data = finalize_upload(session, user_agent, creation_id, _upload_result(target, crcs), title, schedule_time, retry=retry)
+            if data is not None:
+                ready.append((user, session, user_agent, data))
+
+        # All posts are signed with one signer launch, a deferred post signs again on its retry.
+        mstokens = [session.cookies.get("msToken") for _, session, _, _ in ready]
+        signatures = sign_batch([(_signature_url(mstoken), user_agent) for mstoken, (_, _, user_agent, _) in zip(mstokens, ready)])
+        signed = {
+            user: (mstoken, tt_output)
+            for (user, *_), mstoken, tt_output in zip(ready, mstokens, signatures)
+            if tt_output is not None
+        }
 
+        def post(user: str, session: requests.Session, user_agent: str, data: dict) -> bool | None:
+            return post_video(session, user_agent, data, schedule_time, signed.pop(user, None))
+
+        # One queue for all accounts, so a throttled account waits without holding up the others.
+        queue = PublishQueue()
+        for user, session, user_agent, data in ready:
+            queue.add(user, user, session.cookies.get("tt-target-idc"), functools.partial(post, user, session, user_agent, data))
+        results.update(queue.run())
+    finally:
+        metrics.flush()
+    return results
 
 
 if __name__ == "__main__":
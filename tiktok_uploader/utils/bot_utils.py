@@ -2,27 +2,141 @@
 
 from __future__ import annotations
 
+import datetime
+import hashlib
+import hmac
 import json
+import os
 import re
 import secrets
 import string
 import subprocess
+import threading
 import time
 import uuid
 import zlib
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlparse
 
 import requests
 from requests_auth_aws_sigv4 import AWSSigV4
 
+from ..config.settings import Config
+from .mentions import get_mention_cache
+
 user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 
 
+class SignerProcesses:
+    """Запуск node-процессов подписи с общим ограничением.
+
+    Одновременно работает не больше ``limit`` процессов, остальные вызовы
+    ждут свободного места. Процесс, не завершившийся за ``timeout`` секунд,
+    убивается и дожидается, stderr попадает в сообщение об ошибке.
+    """
+
+    def __init__(self, limit: int = 2, timeout: float = 60) -> None:
+        self.limit = max(1, limit)
+        self.timeout = timeout
+        self.launches = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.seconds = 0.0
+        self._slots = threading.BoundedSemaphore(self.limit)
+        self._lock = threading.Lock()
+
+    def run(self, args: List[str], input: str | None = None, timeout: float | None = None) -> str | None:
+        """Stdout процесса или None, если он упал, завис или ничего не вывел."""
+        timeout = timeout or self.timeout
+        with self._slots:
+            started = time.perf_counter()
+            proc = subprocess.Popen(
+                args,
+                stdin=subprocess.DEVNULL if input is None else subprocess.PIPE,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding="utf-8",
+                env=signer_env(),
+            )
+            try:
+                out, err = proc.communicate(input, timeout=timeout)
+                timed_out = False
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                out, err = proc.communicate()
+                timed_out = True
+        failed = timed_out or proc.returncode != 0 or not out.strip()
+        with self._lock:
+            self.launches += 1
+            self.failures += failed
+            self.timeouts += timed_out
+            self.seconds += time.perf_counter() - started
+        if timed_out:
+            print(f"[-] Процесс подписи не ответил за {timeout} с и остановлен: {err.strip()[-500:]}")
+        elif failed:
+            print(f"[-] Процесс подписи завершился с кодом {proc.returncode}: {err.strip()[-500:]}")
+        return None if failed else out
+
+    def stats(self) -> Dict[str, float]:
+        """Счётчики запусков, ошибок, таймаутов и средняя длительность запуска."""
+        with self._lock:
+            return {
+                "launches": self.launches,
+                "failures": self.failures,
+                "timeouts": self.timeouts,
+                "avg_seconds": self.seconds / self.launches if self.launches else 0.0,
+            }
+
+
+def signer_env() -> Dict[str, str]:
+    """Окружение node-процессов подписи с настройками из конфигурации."""
+    return {**os.environ, "SIGNER_BOOTSTRAP": Config.get().signer_bootstrap}
+
+
+_signer_processes: SignerProcesses | None = None
+_signer_processes_lock = threading.Lock()
+
+
+def signer_processes() -> SignerProcesses:
+    """Общий для процесса менеджер, настроенный из конфигурации."""
+    global _signer_processes
+    with _signer_processes_lock:
+        if _signer_processes is None:
+            config = Config.get()
+            _signer_processes = SignerProcesses(config.signer_max_procs, config.signer_timeout)
+        return _signer_processes
+
+
 def subprocess_jsvmp(js: str, ua: str, url: str) -> str | None:
     """Запускает node-скрипт для генерации подписи."""
-    proc = subprocess.Popen(["node", js, url, ua], stdout=subprocess.PIPE)
-    out = proc.stdout.read().decode("utf-8") if proc.stdout else ""
-    return out
+    return signer_processes().run(["node", js, url, ua])
+
+
+def subprocess_jsvmp_batch(
+    js: str,
+    pending: List[Tuple[str, str]],
+    contexts: int = 2,
+    timeout: float | None = None,
+) -> List[Dict[str, Any] | None]:
+    """Подписывает пары (url, user agent) одним запуском ``node js --batch``.
+
+    Возвращает данные подписи в порядке ``pending``, None - для
+    неподписанных запросов.
+    """
+    results: List[Dict[str, Any] | None] = [None] * len(pending)
+    if not pending:
+        return results
+    # Requests with the same user agent go out together, so a browser context is reused for them.
+    order = sorted(range(len(pending)), key=lambda i: pending[i][1])
+    payload = "".join(json.dumps({"id": i, "url": pending[i][0], "user_agent": pending[i][1]}) + "\n" for i in order)
+    out = signer_processes().run(["node", js, "--batch", str(contexts)], input=payload, timeout=timeout)
+    for line in (out or "").splitlines():
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        request_id = message.get("id")
+        if message.get("status") == "ok" and isinstance(request_id, int) and 0 <= request_id < len(results):
+            results[request_id] = message["data"]
+    return results
 
 
 def generate_random_string(length: int, underline: bool) -> str:
@@ -53,7 +167,86 @@ def assert_success(url: str, resp: requests.Response) -> bool:
     return resp.status_code == 200
 
 
-def convert_tags(text: str, session: requests.Session) -> tuple[str, List[Dict[str, Any]]]:
+MENTION_RE = re.compile(r'#(\w+)|@([\w.-]+)|([^#@]+)')
+_USER_ID_MARKER = 'webapp.user-detail":{"userInfo":{"user":{"id":"'
+PROFILE_CHUNK_SIZE = 16384
+
+
+def profile_request(username: str) -> tuple[str, Dict[str, str]]:
+    """URL и заголовки запроса страницы профиля."""
+    url = "https://www.tiktok.com/@" + username
+    headers = {
+        "authority": "www.tiktok.com",
+        "accept": "*/*",
+        "accept-language": "ru-RU,ru;q=0.9",
+        "user-agent": user_agent,
+    }
+    return url, headers
+
+
+class UserIdNotFoundError(Exception):
+    """На странице профиля нет user id."""
+
+
+class UserIdScanner:
+    """Ищет user id в HTML профиля, получаемом частями.
+
+    Маркер может быть разрезан между частями, поэтому хвост предыдущей
+    части сохраняется. Ничего, кроме хвоста, в памяти не держится.
+    """
+
+    _MARKER = _USER_ID_MARKER.encode("utf-8")
+    _MAX_ID_LENGTH = 64
+
+    def __init__(self) -> None:
+        self._tail = b""
+
+    def feed(self, chunk: bytes) -> str | None:
+        """User id, как только он найден, иначе None."""
+        buffer = self._tail + chunk
+        start = buffer.find(self._MARKER)
+        if start == -1:
+            self._tail = buffer[-(len(self._MARKER) - 1):]
+            return None
+        start += len(self._MARKER)
+        end = buffer.find(b'"', start)
+        if end == -1:
+            if len(buffer) - start > self._MAX_ID_LENGTH:
+                raise UserIdNotFoundError("user id in the profile page is not terminated")
+            self._tail = buffer[start - len(self._MARKER):]
+            return None
+        return buffer[start:end].decode("utf-8")
+
+
+def parse_user_id(html: str) -> str:
+    """Извлекает user id из HTML страницы профиля."""
+    user_id = UserIdScanner().feed(html.encode("utf-8"))
+    if not user_id:
+        raise UserIdNotFoundError("user id not found in the profile page")
+    return user_id
+
+
+def fetch_user_id(session: requests.Session, username: str) -> str:
+    """User id из страницы профиля, загрузка прерывается, как только он найден."""
+    url, headers = profile_request(username)
+    with session.request("GET", url, headers=headers, stream=True) as r:
+        if r.status_code != 200:
+            raise UserIdNotFoundError(f"profile @{username} answered {r.status_code}")
+        scanner = UserIdScanner()
+        for chunk in r.iter_content(PROFILE_CHUNK_SIZE):
+            user_id = scanner.feed(chunk)
+            if user_id:
+                return user_id
+    raise UserIdNotFoundError(f"user id not found in profile @{username}")
+
+
+def find_mentions(text: str) -> List[str]:
+    """Имена пользователей, упомянутых в тексте через @."""
+    return [m.group(2) for m in MENTION_RE.finditer(text) if m.group(2)]
+
+
+def build_tags(text: str, user_ids: Dict[str, str]) -> tuple[str, List[Dict[str, Any]]]:
+    """Размечает хэштеги и упоминания, ``user_ids`` сопоставляет имя и user id."""
     end = 0
     i = -1
     text_extra: List[Dict[str, Any]] = []
@@ -76,20 +269,73 @@ def convert_tags(text: str, session: requests.Session) -> tuple[str, List[Dict[s
             end += len(match.group(1)) + 1
             return f"<h id=\"{i}\">#{match.group(1)}</h>"
         if match.group(2):
-            url = "https://www.tiktok.com/@" + match.group(2)
-            headers = {
-                "authority": "www.tiktok.com",
-                "accept": "*/*",
-                "accept-language": "ru-RU,ru;q=0.9",
-                "user-agent": user_agent,
-            }
-            r = session.request("GET", url, headers=headers)
-            user_id = r.text.split('webapp.user-detail":{"userInfo":{"user":{"id":"')[1].split('"')[0]
+            user_id = user_ids.get(match.group(2), "")
+            if not user_id:
+                # Unresolved mention: posted as plain text.
+                end += len(match.group(2)) + 1
+                return f"@{match.group(2)}"
             text_extra.append(text_extra_block(end, end + len(match.group(2)) + 1, 0, "", user_id, str(i)))
             end += len(match.group(2)) + 1
             return f"<m id=\"{i}\">@{match.group(2)}</m>"
         end += len(match.group(3))
         return match.group(3)
 
-    result = re.sub(r'#(\w+)|@([\w.-]+)|([^#@]+)', convert, text)
+    result = MENTION_RE.sub(convert, text)
     return result, text_extra
+
+
+def convert_tags(text: str, session: requests.Session) -> tuple[str, List[Dict[str, Any]]]:
+    """Размечает текст, user id упоминаний берутся из общего кэша."""
+    return build_tags(text, get_mention_cache().resolve(find_mentions(text), lambda username: fetch_user_id(session, username)))
+
+
+def sigv4_headers(
+    method: str,
+    url: str,
+    body: bytes | str | None,
+    token: Dict[str, str],
+    region: str = "ap-singapore-1",
+    service: str = "vod",
+    now: datetime.datetime | None = None,
+) -> Dict[str, str]:
+    """Заголовки AWS SigV4 для клиентов без поддержки ``requests`` auth.
+
+    Подпись строится так же, как в ``requests_auth_aws_sigv4.AWSSigV4``,
+    ``token`` - это ``video_token_v5`` из ответа upload/auth.
+    """
+    t = now or datetime.datetime.now(datetime.timezone.utc)
+    amzdate = t.strftime("%Y%m%dT%H%M%SZ")
+    datestamp = t.strftime("%Y%m%d")
+
+    parsed = urlparse(url)
+    qs = dict(item.split("=", 1) for item in parsed.query.split("&")) if parsed.query else {}
+    canonical_querystring = "&".join("=".join(item) for item in sorted(qs.items()))
+
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    payload_hash = hashlib.sha256(b"" if method == "GET" or not body else body).hexdigest()
+
+    headers = {
+        "host": parsed.hostname,
+        "x-amz-date": amzdate,
+        "x-amz-security-token": token["session_token"],
+        "x-amz-content-sha256": payload_hash,
+    }
+    signed_headers = ";".join(sorted(headers))
+    canonical_headers = "".join(f"{h}:{headers[h]}\n" for h in sorted(headers))
+    canonical_request = "\n".join([method, parsed.path, canonical_querystring, canonical_headers, signed_headers, payload_hash])
+
+    credential_scope = "/".join([datestamp, region, service, "aws4_request"])
+    string_to_sign = "\n".join(["AWS4-HMAC-SHA256", amzdate, credential_scope, hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()])
+
+    key = ("AWS4" + token["secret_acess_key"]).encode("utf-8")
+    for msg in (datestamp, region, service, "aws4_request"):
+        key = hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+    signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    del headers["host"]
+    headers["Authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={token['access_key_id']}/{credential_scope}, "
+        f"SignedHeaders={signed_headers}, Signature={signature}"
+    )
+    return headers
@@ -2,27 +2,271 @@
 
 from __future__ import annotations
 
+import glob
+import json
 import os
 import pickle
-from typing import List
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Tuple
 
 from ..config.settings import Config
 from .basics import eprint
 
+SESSION_PREFIX = "tiktok_session-"
+_DB_FILE = "sessions.db"
 
-def _cookie_path(filename: str, cookies_path: str | None = None) -> str:
-    base = cookies_path or os.path.join(os.getcwd(), Config.get().cookies_dir)
-    return os.path.join(base, f"{filename}.cookie")
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    name TEXT PRIMARY KEY,
+    cookies TEXT NOT NULL,
+    dc TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_dc ON sessions (dc);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Columns added after the first release of the store, created on open when missing.
+_COLUMNS = (
+    ("proxy", "TEXT"),
+    ("status", "TEXT"),
+    ("latency", "REAL"),
+    ("checked_at", "REAL"),
+)
+
+_stores: Dict[str, "CookieStore"] = {}
+_stores_lock = threading.Lock()
+
+
+def _cookies_dir(cookies_path: str | None = None) -> str:
+    return cookies_path or os.path.join(os.getcwd(), Config.get().cookies_dir)
+
+
+def _dc_of(cookies: List[dict] | None) -> str | None:
+    return next((c.get("value") for c in cookies or [] if c.get("name") == "tt-target-idc"), None)
+
+
+class CookieStore:
+    """Cookie всех аккаунтов в одной базе SQLite.
+
+    База лежит в ``COOKIES_DIR/sessions.db``, при первом открытии в неё
+    импортируются старые pickle-файлы ``*.cookie``. Запись идёт в
+    транзакции ``BEGIN IMMEDIATE`` в режиме WAL, поэтому несколько
+    процессов могут писать одновременно. Прочитанные cookie кэшируются в
+    процессе, пока не изменится mtime файлов базы.
+    """
+
+    def __init__(self, cookies_path: str | None = None) -> None:
+        self.dir = _cookies_dir(cookies_path)
+        self.path = os.path.join(self.dir, _DB_FILE)
+        self._local = threading.local()
+        self._cache: Dict[str, List[dict]] = {}
+        self._cache_stamp: Tuple = ()
+        self._lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+        self._migrate()
+        self.import_pickles()
+
+    def _migrate(self) -> None:
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+        for column, kind in _COLUMNS:
+            if column not in existing:
+                try:
+                    conn.execute(f"ALTER TABLE sessions ADD COLUMN {column} {kind}")
+                except sqlite3.OperationalError:
+                    # Another process added it first.
+                    pass
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, statements: List[Tuple[str, tuple]]) -> None:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                conn.execute(sql, params)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _stamp(self) -> Tuple:
+        stamp = []
+        for path in (self.path, self.path + "-wal"):
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _save_statement(self, name: str, cookies: List[dict] | None) -> Tuple[str, tuple]:
+        return (
+            "INSERT INTO sessions (name, cookies, dc, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET cookies = excluded.cookies, dc = excluded.dc, "
+            "updated_at = excluded.updated_at, status = NULL",
+            (name, json.dumps(cookies or []), _dc_of(cookies), time.time()),
+        )
+
+    def import_pickles(self) -> int:
+        """Разовый импорт pickle-файлов, уже сохранённые аккаунты не трогаются."""
+        conn = self._connect()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'pickles_imported'").fetchone():
+            return 0
+        statements = []
+        for path in sorted(glob.glob(os.path.join(self.dir, "*.cookie"))):
+            cookies = self._read_pickle(path)
+            if cookies is not None:
+                statements.append((
+                    "INSERT OR IGNORE INTO sessions (name, cookies, dc, updated_at) VALUES (?, ?, ?, ?)",
+                    (os.path.basename(path)[:-len(".cookie")], json.dumps(cookies), _dc_of(cookies), time.time()),
+                ))
+        statements.append(("INSERT OR REPLACE INTO meta (key, value) VALUES ('pickles_imported', ?)", (str(time.time()),)))
+        self._write(statements)
+        if len(statements) > 1:
+            print(f"Импортировано файлов cookie: {len(statements) - 1}")
+        return len(statements) - 1
+
+    @staticmethod
+    def _read_pickle(path: str) -> List[dict] | None:
+        try:
+            with open(path, "rb") as f:
+                cookies = pickle.load(f)
+            json.dumps(cookies)
+        except (OSError, pickle.UnpicklingError, EOFError, TypeError, ValueError) as e:
+            eprint(f"Не удалось импортировать {path}: {e}")
+            return None
+        return cookies
+
+    def load(self, name: str) -> List[dict] | None:
+        """Cookie аккаунта или None, если его нет."""
+        with self._lock:
+            stamp = self._stamp()
+            if stamp != self._cache_stamp:
+                self._cache.clear()
+                self._cache_stamp = stamp
+            cookies = self._cache.get(name)
+        if cookies is None:
+            row = self._connect().execute("SELECT cookies FROM sessions WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                # A pickle written by an older version after the one-time import.
+                legacy = os.path.join(self.dir, f"{name}.cookie")
+                if not os.path.exists(legacy) or (cookies := self._read_pickle(legacy)) is None:
+                    return None
+                self.save(name, cookies)
+            else:
+                cookies = json.loads(row[0])
+            with self._lock:
+                self._cache[name] = cookies
+        return [dict(c) for c in cookies]
+
+    def save(self, name: str, cookies: List[dict] | None) -> None:
+        self._write([self._save_statement(name, cookies)])
+
+    def set_dc(self, name: str, dc: str) -> bool:
+        """Меняет датацентр аккаунта, False - если аккаунта нет."""
+        cookies = self.load(name)
+        if cookies is None:
+            return False
+        cookies = [c for c in cookies if c.get("name") != "tt-target-idc"]
+        cookies.append({"name": "tt-target-idc", "value": dc})
+        self.save(name, cookies)
+        return True
+
+    def info(self, name: str) -> Dict[str, Any] | None:
+        """Датацентр, прокси и результат последней проверки аккаунта."""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT dc, proxy, status, latency, checked_at, updated_at FROM sessions WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("dc", "proxy", "status", "latency", "checked_at", "updated_at"), row))
+
+    def set_proxy(self, name: str, proxy: str | None) -> None:
+        """Прокси, через который работает аккаунт, None - без прокси."""
+        self._write([("UPDATE sessions SET proxy = ? WHERE name = ?", (proxy or None, name))])
+
+    def record_check(self, name: str, status: str, dc: str | None, latency: float | None) -> None:
+        """Сохраняет результат проверки сессии, новый датацентр попадает и в cookie."""
+        statements = [(
+            "UPDATE sessions SET status = ?, latency = ?, checked_at = ? WHERE name = ?",
+            (status, latency, time.time(), name),
+        )]
+        cookies = self.load(name) if dc else None
+        if cookies is not None and _dc_of(cookies) != dc:
+            cookies = [c for c in cookies if c.get("name") != "tt-target-idc"]
+            cookies.append({"name": "tt-target-idc", "value": dc})
+            statements.append((
+                "UPDATE sessions SET cookies = ?, dc = ? WHERE name = ?",
+                (json.dumps(cookies), dc, name),
+            ))
+        self._write(statements)
+
+    def delete(self, name: str) -> bool:
+        existed = self._connect().execute("SELECT 1 FROM sessions WHERE name = ?", (name,)).fetchone() is not None
+        self._write([("DELETE FROM sessions WHERE name = ?", (name,))])
+        legacy = os.path.join(self.dir, f"{name}.cookie")
+        if os.path.exists(legacy):
+            os.remove(legacy)
+        return existed
+
+    def delete_all(self) -> None:
+        self._write([("DELETE FROM sessions", ())])
+        for path in glob.glob(os.path.join(self.dir, "*.cookie")):
+            os.remove(path)
+
+    def names(self, prefix: str = "", dc: str | None = None, status: str | None = None) -> List[str]:
+        """Имена сохранённых cookie по индексу, с фильтром по датацентру и статусу проверки."""
+        sql = "SELECT name FROM sessions WHERE name >= ? AND name < ?"
+        params: tuple = (prefix, prefix + "\uffff")
+        if dc is not None:
+            sql += " AND dc = ?"
+            params += (dc,)
+        if status is not None:
+            sql += " AND status = ?"
+            params += (status,)
+        return [row[0] for row in self._connect().execute(sql + " ORDER BY name", params)]
+
+    def accounts(self, dc: str | None = None, status: str | None = None) -> List[str]:
+        """Имена аккаунтов, сохранённых через login."""
+        return [name[len(SESSION_PREFIX):] for name in self.names(SESSION_PREFIX, dc, status)]
+
+
+def get_cookie_store(cookies_path: str | None = None) -> CookieStore:
+    """Хранилище cookie каталога ``cookies_path`` или ``COOKIES_DIR``."""
+    path = os.path.abspath(_cookies_dir(cookies_path))
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = CookieStore(path)
+        return store
+
+
+def list_accounts(dc: str | None = None, cookies_path: str | None = None) -> List[str]:
+    """Сохранённые аккаунты, при ``dc`` - только этого датацентра."""
+    return get_cookie_store(cookies_path).accounts(dc)
 
 
 def load_cookies_from_file(filename: str, cookies_path: str | None = None) -> List[dict]:
-    """Загружает cookies из файла."""
-    path = _cookie_path(filename, cookies_path)
-    if not os.path.exists(path):
+    """Загружает cookies из хранилища."""
+    cookie_data = get_cookie_store(cookies_path).load(filename)
+    if cookie_data is None:
         print("Пользователь не найден.")
         return []
-    with open(path, "rb") as f:
-        cookie_data = pickle.load(f)
     cookies = []
     for cookie in cookie_data:
         if "sameSite" in cookie and cookie["sameSite"] == "None":
@@ -32,31 +276,25 @@ def load_cookies_from_file(filename: str, cookies_path: str | None = None) -> Li
 
 
 def save_cookies_to_file(cookies: List[dict] | None, filename: str, cookies_path: str | None = None) -> None:
-    """Сохраняет cookies в файл."""
-    path = _cookie_path(filename, cookies_path)
-    print("Сохранение cookies в файл:", path)
-    with open(path, "wb") as f:
-        pickle.dump(cookies, f)
+    """Сохраняет cookies в хранилище."""
+    store = get_cookie_store(cookies_path)
+    print("Сохранение cookies:", filename)
+    store.save(filename, cookies)
 
 
 def delete_cookies_file(filename: str, cookies_path: str | None = None) -> None:
-    path = _cookie_path(filename, cookies_path)
-    if os.path.exists(path):
-        os.remove(path)
-        print("Файл cookie удалён:", path)
+    if get_cookie_store(cookies_path).delete(filename):
+        print("Cookie удалены:", filename)
     else:
-        print("Файла cookie не существует:", path)
+        print("Cookie не существуют:", filename)
 
 
 def delete_all_cookies_files(cookies_path: str | None = None) -> None:
-    dir_path = cookies_path or os.path.join(os.getcwd(), Config.get().cookies_dir)
-    for name in os.listdir(dir_path):
-        if name.endswith(".cookie"):
-            os.remove(os.path.join(dir_path, name))
-            print("Удалён файл cookie:", name)
-    print("Удалены все файлы cookie.")
+    get_cookie_store(cookies_path).delete_all()
+    print("Удалены все cookie.")
 
 
-def update_dc_location(filename: str, new_dc_location: str) -> None:
-    """Placeholder for updating datacenter location."""
-    raise NotImplementedError
+def update_dc_location(filename: str, new_dc_location: str, cookies_path: str | None = None) -> None:
+    """Меняет cookie ``tt-target-idc`` сохранённого аккаунта."""
+    if not get_cookie_store(cookies_path).set_dc(filename, new_dc_location):
+        print("Пользователь не найден.")
@@ -0,0 +1,150 @@
+"""Кэш user id упомянутых через @ пользователей."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Iterable, List, Tuple
+
+from ..config.settings import Config
+
+_CACHE_FILE = "mentions.json"
+_LOOKUP_WORKERS = 8
+
+_cache: "MentionCache | None" = None
+_cache_lock = threading.Lock()
+
+
+class MentionCache:
+    """Имя пользователя -> user id с временем жизни ``MENTION_CACHE_TTL``.
+
+    Кэш хранится в ``STATE_DIR`` и общий для всех аккаунтов процесса.
+    Незакэшированные имена ищутся параллельно, а поиск имени, которое
+    уже ищет другой поток или задача, ждёт его результат вместо второго
+    запроса. Неудачный поиск возвращает пустой id и не кэшируется.
+    """
+
+    def __init__(self, path: str | None = None, ttl: int | None = None) -> None:
+        self.path = path or Config.get().state_path(_CACHE_FILE)
+        self.ttl = Config.get().mention_cache_ttl if ttl is None else ttl
+        self._entries: Dict[str, Tuple[str, float]] | None = None
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Tuple[str, float]]:
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = {name: tuple(entry) for name, entry in json.load(f).items()}
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _fresh(self, username: str) -> str | None:
+        entry = self._load().get(username)
+        if entry is None or time.time() - entry[1] >= self.ttl:
+            return None
+        return entry[0]
+
+    def get(self, username: str) -> str | None:
+        """Сохранённый user id или None, если его нет или он устарел."""
+        with self._lock:
+            return self._fresh(username)
+
+    def _claim(self, usernames: Iterable[str]) -> Tuple[Dict[str, str], Dict[str, Future], List[str]]:
+        """Делит имена на закэшированные, уже искомые и те, что ищет вызывающий."""
+        found: Dict[str, str] = {}
+        waiting: Dict[str, Future] = {}
+        mine: List[str] = []
+        for username in dict.fromkeys(usernames):
+            with self._lock:
+                user_id = self._fresh(username)
+                if user_id is not None:
+                    found[username] = user_id
+                elif username in self._inflight:
+                    waiting[username] = self._inflight[username]
+                else:
+                    self._inflight[username] = Future()
+                    mine.append(username)
+        return found, waiting, mine
+
+    def _finish(self, resolved: Dict[str, str]) -> None:
+        now = time.time()
+        with self._lock:
+            entries = self._load()
+            for username, user_id in resolved.items():
+                if user_id:
+                    entries[username] = (user_id, now)
+            futures = [self._inflight.pop(username) for username in resolved]
+            if any(resolved.values()):
+                self._save(entries)
+        for future, user_id in zip(futures, resolved.values()):
+            future.set_result(user_id)
+
+    def _save(self, entries: Dict[str, Tuple[str, float]]) -> None:
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"[-] Не удалось сохранить кэш упоминаний: {e}")
+
+    @staticmethod
+    def _safe(username: str, user_id: str | BaseException) -> str:
+        if isinstance(user_id, BaseException):
+            print(f"[-] Не удалось найти user id @{username}: {user_id}")
+            return ""
+        return user_id
+
+    def resolve(self, usernames: Iterable[str], lookup: Callable[[str], str]) -> Dict[str, str]:
+        """User id для каждого имени, ``lookup`` вызывается только для промахов."""
+        found, waiting, mine = self._claim(usernames)
+        if mine:
+            def run(username: str) -> str | BaseException:
+                try:
+                    return lookup(username)
+                except Exception as e:
+                    return e
+
+            try:
+                with ThreadPoolExecutor(min(_LOOKUP_WORKERS, len(mine))) as pool:
+                    resolved = {name: self._safe(name, user_id) for name, user_id in zip(mine, pool.map(run, mine))}
+            except BaseException:
+                self._finish(dict.fromkeys(mine, ""))
+                raise
+            self._finish(resolved)
+            found.update(resolved)
+        for username, future in waiting.items():
+            found[username] = future.result()
+        return found
+
+    async def resolve_async(self, usernames: Iterable[str], lookup: Callable[[str], Awaitable[str]]) -> Dict[str, str]:
+        """Асинхронный аналог ``resolve`` с корутиной ``lookup``."""
+        found, waiting, mine = self._claim(usernames)
+        if mine:
+            try:
+                results = await asyncio.gather(*(lookup(name) for name in mine), return_exceptions=True)
+            except BaseException:
+                # Cancelled: release the names so waiting lookups do not hang.
+                self._finish(dict.fromkeys(mine, ""))
+                raise
+            resolved = {name: self._safe(name, user_id) for name, user_id in zip(mine, results)}
+            self._finish(resolved)
+            found.update(resolved)
+        for username, future in waiting.items():
+            found[username] = await asyncio.wrap_future(future)
+        return found
+
+
+def get_mention_cache() -> MentionCache:
+    """Общий для процесса кэш упоминаний."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = MentionCache()
+        return _cache
@@ -0,0 +1,216 @@
+"""Клиенты node-подписчика из tiktok-signature."""
+
+from __future__ import annotations
+
+import atexit
+import itertools
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Dict, List, Tuple
+
+from ..config.settings import Config
+from .bot_utils import signer_env, subprocess_jsvmp, subprocess_jsvmp_batch
+
+SIGNER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tiktok-signature")
+BROWSER_JS = os.path.join(SIGNER_DIR, "browser.js")
+VM_JS = os.path.join(SIGNER_DIR, "vm.js")
+DAEMON_JS = os.path.join(SIGNER_DIR, "daemon.js")
+SIGNER_SCRIPTS = {"browser": BROWSER_JS, "vm": VM_JS}
+
+_daemon: "SignerDaemon | None" = None
+_daemon_lock = threading.Lock()
+
+
+class SignerError(Exception):
+    """Подписчик не ответил или вернул ошибку."""
+
+
+class SignerDaemon:
+    """Клиент долгоживущего ``daemon.js``.
+
+    Запросы и ответы - JSON по строке через stdin/stdout, ответы
+    сопоставляются по ``id``, поэтому подписывать могут несколько потоков
+    сразу. Упавший или зависший процесс убивается и перезапускается при
+    следующем запросе.
+    """
+
+    def __init__(self, script: str = DAEMON_JS, timeout: float | None = None, backend: str | None = None) -> None:
+        self.script = script
+        self.backend = backend
+        self.timeout = timeout or Config.get().signer_timeout
+        self.proc: subprocess.Popen | None = None
+        self.restarts = 0
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, Tuple[subprocess.Popen, Future]] = {}
+        self._stderr: deque = deque(maxlen=20)
+        self._start_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def start(self) -> subprocess.Popen:
+        with self._start_lock:
+            if not self.alive:
+                if self.proc is not None:
+                    self.restarts += 1
+                self.proc = subprocess.Popen(
+                    ["node", self.script, *([self.backend] if self.backend else [])],
+                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                    text=True, encoding="utf-8", bufsize=1, cwd=os.path.dirname(self.script),
+                    env=signer_env(),
+                )
+                threading.Thread(target=self._read_stdout, args=(self.proc,), daemon=True).start()
+                threading.Thread(target=self._read_stderr, args=(self.proc,), daemon=True).start()
+            return self.proc
+
+    def _read_stdout(self, proc: subprocess.Popen) -> None:
+        for line in proc.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            entry = self._pending.pop(message.get("id"), None)
+            if entry is not None:
+                entry[1].set_result(message)
+        # The process is gone, fail the requests that were sent to it.
+        for request_id, (owner, future) in list(self._pending.items()):
+            if owner is proc and self._pending.pop(request_id, None):
+                future.set_exception(SignerError(f"signer exited: {self.stderr_tail()}"))
+
+    def _read_stderr(self, proc: subprocess.Popen) -> None:
+        for line in proc.stderr:
+            self._stderr.append(line.rstrip())
+
+    def stderr_tail(self) -> str:
+        return "\n".join(self._stderr)
+
+    def request(self, method: str, params: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        proc = self.start()
+        request_id = next(self._ids)
+        future: Future = Future()
+        self._pending[request_id] = (proc, future)
+        try:
+            with self._write_lock:
+                proc.stdin.write(json.dumps({"id": request_id, "method": method, "params": params or {}}) + "\n")
+                proc.stdin.flush()
+            message = self._wait(proc, future)
+        except (OSError, ValueError) as e:
+            self._pending.pop(request_id, None)
+            self.kill()
+            raise SignerError(f"signer is not reachable: {e}") from e
+        except FutureTimeout:
+            self._pending.pop(request_id, None)
+            self.kill()
+            raise SignerError(f"signer did not answer in {self.timeout} s") from None
+        except SignerError:
+            self._pending.pop(request_id, None)
+            self.kill()
+            raise
+        if message.get("status") != "ok":
+            raise SignerError(message.get("error") or "signer error")
+        return message["data"]
+
+    def _wait(self, proc: subprocess.Popen, future: Future) -> Dict[str, Any]:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                return future.result(timeout=min(0.5, max(0.0, deadline - time.monotonic())))
+            except FutureTimeout:
+                if proc.poll() is not None and not future.done():
+                    raise SignerError(f"signer exited: {self.stderr_tail()}") from None
+                if time.monotonic() >= deadline:
+                    raise
+
+    def ping(self) -> bool:
+        """Проверка здоровья, неответивший процесс будет перезапущен."""
+        try:
+            self.request("ping")
+        except SignerError:
+            return False
+        return True
+
+    def sign(self, url: str, user_agent: str) -> Dict[str, Any]:
+        return self.request("sign", {"url": url, "user_agent": user_agent})
+
+    def kill(self) -> None:
+        proc = self.proc
+        if proc is None or proc.poll() is not None:
+            return
+        proc.kill()
+        proc.wait()
+
+    def close(self) -> None:
+        proc = self.proc
+        if proc is None or proc.poll() is not None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+
+
+def get_daemon() -> SignerDaemon:
+    """Общий для процесса демон подписи, закрывается при выходе."""
+    global _daemon
+    with _daemon_lock:
+        if _daemon is None:
+            _daemon = SignerDaemon(backend=Config.get().signer_backend)
+            atexit.register(_daemon.close)
+        return _daemon
+
+
+def signer_script() -> str:
+    """Скрипт подписи для ``SIGNER_BACKEND``: Chromium или Node vm."""
+    backend = Config.get().signer_backend
+    if backend not in SIGNER_SCRIPTS:
+        raise ValueError(f"Unknown SIGNER_BACKEND: {backend}")
+    return SIGNER_SCRIPTS[backend]
+
+
+def sign_once(url: str, user_agent: str) -> Dict[str, Any] | None:
+    """Подпись разовым запуском ``browser.js`` или ``vm.js``."""
+    signatures = subprocess_jsvmp(signer_script(), user_agent, url)
+    if signatures is None:
+        print("[-] Failed to generate signatures")
+        return None
+    try:
+        return json.loads(signatures)["data"]
+    except (json.JSONDecodeError, KeyError) as e:
+        print(f"[-] Failed to parse signature data: {str(e)}")
+        return None
+
+
+def sign_url(url: str, user_agent: str) -> Dict[str, Any] | None:
+    """Подписывает URL project/post.
+
+    При ``SIGNER_MODE=daemon`` запрос идёт в тёплый демон, а если он
+    недоступен - в разовый запуск. ``SIGNER_BACKEND=vm`` подписывает без
+    Chromium, в контексте Node vm.
+    """
+    if Config.get().signer_mode == "daemon":
+        try:
+            return get_daemon().sign(url, user_agent)
+        except SignerError as e:
+            print(f"[-] Демон подписи недоступен, разовый запуск: {e}")
+    return sign_once(url, user_agent)
+
+
+def sign_batch(pending: List[Tuple[str, str]]) -> List[Dict[str, Any] | None]:
+    """Подписывает очередь пар (url, user agent).
+
+    Тёплый демон подписывает их по одной, без демона вся очередь
+    подписывается одним запуском Chromium на ``SIGNER_BATCH_CONTEXTS``
+    контекстах.
+    """
+    config = Config.get()
+    if config.signer_mode == "daemon":
+        return [sign_url(url, user_agent) for url, user_agent in pending]
+    return subprocess_jsvmp_batch(signer_script(), pending, config.signer_batch_contexts, config.signer_timeout * max(1, len(pending)))
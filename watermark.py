@@ -1,9 +1,8 @@
-"""Watermark overlay utilities using ffmpeg-python."""
+"""Watermark overlay utilities built on ffmpeg."""
 
-from pathlib import Path
 from typing import Tuple
 
-import ffmpeg
+from tiktok_uploader.core.pipeline import EditJob
 
 
 def apply_watermark(
@@ -15,6 +14,10 @@ def apply_watermark(
 ) -> str:
     """Apply a watermark image over ``video_path``.
 
+    To combine the watermark with trimming or the caption layout in the
+    same pass, build an :class:`~tiktok_uploader.core.pipeline.EditJob`
+    instead of calling this on an intermediate file.
+
     Parameters
     ----------
     video_path: str
@@ -29,10 +32,6 @@ def apply_watermark(
         Scaling factor for the watermark image.
     """
 
-    video = ffmpeg.input(video_path)
-    wm = ffmpeg.input(image_path)
-    if scale != 1.0:
-        wm = wm.filter("scale", f"iw*{scale}", f"ih*{scale}")
-    overlaid = ffmpeg.overlay(video, wm, x=position[0], y=position[1])
-    ffmpeg.output(overlaid, output_path).overwrite_output().run()
-    return output_path
+    return EditJob(
+        video_path, output_path, watermark=image_path, watermark_position=position, watermark_scale=scale
+    ).run()